@@ -27,7 +27,7 @@ def get_stats(db):
         SUM(CASE WHEN price_predicted > price AND sold_at IS NULL THEN 1 ELSE 0 END) AS deals_above_predicted,
         SUM(CASE WHEN price_predicted > price AND sold_at IS NULL AND is_illiquid = false AND is_invalid = false THEN 1 ELSE 0 END) AS valid_deals,
         SUM(CASE WHEN median_survival_days IS NOT NULL AND sold_at IS NULL THEN 1 ELSE 0 END) AS deals_with_eta
-    FROM listings;
+    FROM listings_scored;
     """
     )
     result = db.execute(sql)
@@ -36,24 +36,27 @@ def get_stats(db):
 
 def get_listings(db, page: int = 1, size: int = 20):
     offset = (page - 1) * size
+    # listing_deals is ordered by its price_difference index; listings
+    # supplies the current flags, which change between refreshes
     sql = text(
         f"""
     SELECT
-        id,
-        name,
-        description,
-        category,
-        city,
-        image,
-        url,
-        price,
-        price_predicted,
-        price_predicted - price as price_difference,
-        median_survival_days,
-        EXTRACT(EPOCH FROM (NOW() - created_at)) / 86400 AS current_days_on_market
-    FROM listings
-    WHERE sold_at IS NULL AND is_invalid = false AND is_illiquid = false AND is_pending_repricing = false AND price_predicted > price
-    ORDER BY price_difference DESC
+        l.id,
+        l.name,
+        l.description,
+        l.category,
+        l.city,
+        l.image,
+        l.url,
+        l.price,
+        d.price_predicted,
+        d.price_predicted - l.price as price_difference,
+        d.median_survival_days,
+        EXTRACT(EPOCH FROM (NOW() - l.created_at)) / 86400 AS current_days_on_market
+    FROM listing_deals d
+    JOIN listings l ON l.id = d.id
+    WHERE l.sold_at IS NULL AND l.is_invalid = false AND l.is_illiquid = false AND l.is_pending_repricing = false AND d.price_predicted > l.price
+    ORDER BY d.price_difference DESC
     LIMIT {size} OFFSET {offset}
     """
     )
@@ -66,15 +69,16 @@ def get_categories(db, page: int = 1, size: int = 20):
     sql = text(
         f"""
     SELECT 
-        category,
+        d.category,
         COUNT(*) as deal_count,
-        SUM(price_predicted - price) as total_diff,
-        AVG(price_predicted - price) as mean_diff,
-        AVG(median_survival_days) as predicted_median_survival_days,
-        AVG(EXTRACT(EPOCH FROM (NOW() - created_at)) / 86400) as mean_current_days_on_market
-    FROM listings
-    WHERE price_predicted > price AND sold_at IS NULL
-    GROUP BY category
+        SUM(d.price_predicted - l.price) as total_diff,
+        AVG(d.price_predicted - l.price) as mean_diff,
+        AVG(d.median_survival_days) as predicted_median_survival_days,
+        AVG(EXTRACT(EPOCH FROM (NOW() - l.created_at)) / 86400) as mean_current_days_on_market
+    FROM listing_deals d
+    JOIN listings l ON l.id = d.id
+    WHERE d.price_predicted > l.price AND l.sold_at IS NULL
+    GROUP BY d.category
     ORDER BY total_diff DESC
     LIMIT {size} OFFSET {offset}
     """
@@ -84,7 +88,7 @@ def get_categories(db, page: int = 1, size: int = 20):
 
 
 def get_schema(db):
-    sql = text("""SELECT * FROM listings LIMIT 1""")
+    sql = text("""SELECT * FROM listings_scored LIMIT 1""")
     result = db.execute(sql)
     return result.mappings().all()
 
@@ -93,23 +97,24 @@ def get_next_best(db, exclude_tuple: tuple[int]):
     sql = text(
         """
     SELECT
-        id,
-        name,
-        description,
-        category,
-        city,
-        image,
-        url,
-        price,
-        price_predicted,
-        price_predicted - price as price_difference,
-        median_survival_days,
-        EXTRACT(EPOCH FROM (NOW() - created_at)) / 86400 AS current_days_on_market,
-        price_new,
-        is_invalid
-    FROM listings
-    WHERE sold_at IS NULL AND id NOT IN :exclude_tuple AND is_pending_repricing = false AND price_predicted > price AND NOT is_illiquid
-    ORDER BY price_difference DESC
+        l.id,
+        l.name,
+        l.description,
+        l.category,
+        l.city,
+        l.image,
+        l.url,
+        l.price,
+        d.price_predicted,
+        d.price_predicted - l.price as price_difference,
+        d.median_survival_days,
+        EXTRACT(EPOCH FROM (NOW() - l.created_at)) / 86400 AS current_days_on_market,
+        l.price_new,
+        l.is_invalid
+    FROM listing_deals d
+    JOIN listings l ON l.id = d.id
+    WHERE l.sold_at IS NULL AND l.id NOT IN :exclude_tuple AND l.is_pending_repricing = false AND d.price_predicted > l.price AND NOT l.is_illiquid
+    ORDER BY d.price_difference DESC
     LIMIT 1
     """
     )
@@ -23,74 +23,79 @@ def debug_listings():
             )
         ).fetchall()
         columns = {row[0]: (row[1], row[2]) for row in result}
-        print(f"price_predicted info: {columns.get('price_predicted', 'MISSING')}")
-        print(
-            f"discount_ratio_predicted type: {columns.get('discount_ratio_predicted', 'MISSING')}"
-        )
+        print(f"price_new info: {columns.get('price_new', 'MISSING')}")
+        print(f"discount_ratio info: {columns.get('discount_ratio', 'MISSING')}")
         print(
             f"is_pending_repricing type: {columns.get('is_pending_repricing', 'MISSING')}"
         )
+        # Predictions live in listing_predictions, read through listings_scored
+        models = conn.execute(
+            text(
+                "SELECT model_name, COUNT(*) FROM listing_predictions GROUP BY model_name"
+            )
+        ).fetchall()
+        print(f"listing_predictions rows: {dict(models)}")
 
         print("\n--- Data Counts ---")
 
         queries = [
-            ("Total listings", "SELECT COUNT(*) FROM listings"),
-            ("Unsold", "SELECT COUNT(*) FROM listings WHERE sold_at IS NULL"),
+            ("Total listings", "SELECT COUNT(*) FROM listings_scored"),
+            ("Unsold", "SELECT COUNT(*) FROM listings_scored WHERE sold_at IS NULL"),
             (
                 "Unsold & Not Pending Repricing",
-                "SELECT COUNT(*) FROM listings WHERE sold_at IS NULL AND is_pending_repricing = false",
+                "SELECT COUNT(*) FROM listings_scored WHERE sold_at IS NULL AND is_pending_repricing = false",
             ),
             (
                 "Unsold & Not Pending & Not Illiquid",
-                "SELECT COUNT(*) FROM listings WHERE sold_at IS NULL AND is_pending_repricing = false AND NOT is_illiquid",
+                "SELECT COUNT(*) FROM listings_scored WHERE sold_at IS NULL AND is_pending_repricing = false AND NOT is_illiquid",
             ),
             (
                 "Unsold & Not Pending & Not Illiquid & Price Predicted > Price",
-                "SELECT COUNT(*) FROM listings WHERE sold_at IS NULL AND is_pending_repricing = false AND NOT is_illiquid AND price_predicted > price",
+                "SELECT COUNT(*) FROM listings_scored WHERE sold_at IS NULL AND is_pending_repricing = false AND NOT is_illiquid AND price_predicted > price",
             ),
             (
                 "Price Predicted IS NULL",
-                "SELECT COUNT(*) FROM listings WHERE price_predicted IS NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_predicted IS NULL",
             ),
             (
                 "Price Predicted NOT NULL",
-                "SELECT COUNT(*) FROM listings WHERE price_predicted IS NOT NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_predicted IS NOT NULL",
             ),
             (
                 "Discount Ratio Predicted NOT NULL",
-                "SELECT COUNT(*) FROM listings WHERE discount_ratio_predicted IS NOT NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE discount_ratio_predicted IS NOT NULL",
             ),
             (
                 "Price New IS NULL",
-                "SELECT COUNT(*) FROM listings WHERE price_new IS NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_new IS NULL",
             ),
             (
                 "Price New = -1 (Not Found)",
-                "SELECT COUNT(*) FROM listings WHERE price_new = -1",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_new = -1",
             ),
             (
                 "Price New > 0 (Found)",
-                "SELECT COUNT(*) FROM listings WHERE price_new > 0",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_new > 0",
             ),
             (
                 "is_pending_repricing IS NULL",
-                "SELECT COUNT(*) FROM listings WHERE is_pending_repricing IS NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE is_pending_repricing IS NULL",
             ),
             (
                 "is_pending_repricing = true",
-                "SELECT COUNT(*) FROM listings WHERE is_pending_repricing = true",
+                "SELECT COUNT(*) FROM listings_scored WHERE is_pending_repricing = true",
             ),
             (
                 "is_pending_repricing = false",
-                "SELECT COUNT(*) FROM listings WHERE is_pending_repricing = false",
+                "SELECT COUNT(*) FROM listings_scored WHERE is_pending_repricing = false",
             ),
             (
                 "Price New > 0 & Discount Ratio NOT NULL",
-                "SELECT COUNT(*) FROM listings WHERE price_new > 0 AND discount_ratio_predicted IS NOT NULL",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_new > 0 AND discount_ratio_predicted IS NOT NULL",
             ),
             (
                 "Price New > 0 & Discount Ratio NOT NULL & Generated Price > Price",
-                "SELECT COUNT(*) FROM listings WHERE price_new > 0 AND discount_ratio_predicted IS NOT NULL AND (price_new * discount_ratio_predicted) > price",
+                "SELECT COUNT(*) FROM listings_scored WHERE price_new > 0 AND discount_ratio_predicted IS NOT NULL AND (price_new * discount_ratio_predicted) > price",
             ),
         ]
 
@@ -104,7 +109,7 @@ def debug_listings():
         print("\n--- Sample Good Deals ---")
         sample_sql = """
             SELECT id, price, price_new, discount_ratio_predicted, price_predicted, is_pending_repricing
-            FROM listings
+            FROM listings_scored
             WHERE price_new > 0 AND discount_ratio_predicted IS NOT NULL AND (price_new * discount_ratio_predicted) > price
             LIMIT 5
         """
@@ -0,0 +1,203 @@
+"""
+Applies the SQL migrations in db/migrations to DATABASE_URL:
+
+    V<version>__<name>.sql  versioned, applied once, in version order
+    R__<name>.sql           repeatable, re-applied whenever the file changes
+
+Applied migrations are recorded in schema_migrations with their checksum;
+editing a versioned migration after it was applied is an error. A file is
+applied in one transaction, unless it builds indexes CONCURRENTLY: those
+files run statement by statement in autocommit, so every statement must be
+idempotent (IF NOT EXISTS), and invalid indexes left by an interrupted
+build are dropped before the retry.
+
+Every service runs this before starting (the `migrate` compose service);
+an advisory lock keeps concurrent runs from interleaving.
+
+    python db/migrate.py            # apply pending migrations
+    python db/migrate.py --status   # list migrations and whether applied
+"""
+
+import argparse, hashlib, logging, os, re, sys, time
+import psycopg2
+
+logging.basicConfig(level=logging.INFO)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+VERSIONED = re.compile(r"V(\d+)__(\w+)\.sql")
+REPEATABLE = re.compile(r"R__(\w+)\.sql")
+CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+    re.IGNORECASE,
+)
+# Arbitrary key shared by every migrate run
+LOCK_KEY = 8402117
+
+
+def split_statements(sql):
+    """Splits a script on top-level semicolons, respecting quotes, comments and $$ bodies."""
+    statements, current, i = [], [], 0
+    while i < len(sql):
+        ch = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end == -1 else end + 2
+            continue
+        dollar = re.match(r"\$(\w*)\$", sql[i:])
+        if dollar:
+            tag = dollar.group(0)
+            end = sql.find(tag, i + len(tag))
+            end = len(sql) if end == -1 else end + len(tag)
+            current.append(sql[i:end])
+            i = end
+            continue
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < len(sql):
+                if sql[end] == ch:
+                    # A doubled quote is an escaped quote
+                    if sql[end + 1 : end + 2] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i : end + 1])
+            i = end + 1
+            continue
+        if ch == ";":
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def discover(directory):
+    """Versioned migrations in version order, then repeatable ones by name."""
+    versioned, repeatable = [], []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            sql = f.read()
+        checksum = hashlib.sha256(sql.encode()).hexdigest()
+        if match := VERSIONED.fullmatch(name):
+            versioned.append((int(match.group(1)), name, sql, checksum))
+        elif REPEATABLE.fullmatch(name):
+            repeatable.append((None, name, sql, checksum))
+    versioned.sort()
+    return versioned + repeatable
+
+
+def applied_checksums(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            version INTEGER,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            duration_ms INTEGER
+        )
+    """
+    )
+    cur.execute("SELECT name, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def record(cur, version, name, checksum, duration_ms):
+    cur.execute(
+        """
+        INSERT INTO schema_migrations (name, version, checksum, duration_ms)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (name) DO UPDATE SET
+            checksum = EXCLUDED.checksum,
+            applied_at = now() AT TIME ZONE 'utc',
+            duration_ms = EXCLUDED.duration_ms
+    """,
+        (name, version, checksum, duration_ms),
+    )
+
+
+def drop_invalid_indexes(cur, sql):
+    for index in CONCURRENT_INDEX.findall(sql):
+        cur.execute(
+            """
+            SELECT 1 FROM pg_index
+            WHERE indexrelid = to_regclass(%s) AND NOT indisvalid
+        """,
+            (index,),
+        )
+        if cur.fetchone():
+            logging.warning(f"db -> migrate: Dropping invalid index {index}")
+            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index}"')
+
+
+def apply(conn, version, name, sql, checksum):
+    logging.info(f"db -> migrate: Applying {name}")
+    start = time.monotonic()
+    statements = split_statements(sql)
+    with conn.cursor() as cur:
+        if CONCURRENT_INDEX.search(sql):
+            drop_invalid_indexes(cur, sql)
+            for statement in statements:
+                cur.execute(statement)
+            record(cur, version, name, checksum, elapsed_ms(start))
+        else:
+            conn.autocommit = False
+            try:
+                for statement in statements:
+                    cur.execute(statement)
+                record(cur, version, name, checksum, elapsed_ms(start))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+    logging.info(f"db -> migrate: Applied {name} in {elapsed_ms(start)}ms")
+
+
+def elapsed_ms(start):
+    return int((time.monotonic() - start) * 1000)
+
+
+def migrate(database_url, directory=MIGRATIONS_DIR, status_only=False):
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+            applied = applied_checksums(cur)
+
+        for version, name, sql, checksum in discover(directory):
+            done = applied.get(name)
+            if status_only:
+                state = (
+                    "applied" if done == checksum else "changed" if done else "pending"
+                )
+                print(f"{state:<8} {name}")
+                continue
+            if done == checksum:
+                continue
+            if done is not None and version is not None:
+                raise SystemExit(
+                    f"{name} was edited after it was applied; add a new migration instead"
+                )
+            apply(conn, version, name, sql, checksum)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--dir", default=MIGRATIONS_DIR)
+    args = parser.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL is not set")
+    migrate(os.environ["DATABASE_URL"], args.dir, args.status)
@@ -0,0 +1,9 @@
+-- Casts text to the type of `result`, or NULL when it does not parse:
+-- try_cast('12', NULL::integer)
+CREATE OR REPLACE FUNCTION try_cast(value text, INOUT result anyelement) AS $$
+BEGIN
+    EXECUTE format('SELECT %L::%s', value, pg_typeof(result)) INTO result;
+EXCEPTION WHEN others THEN
+    result := NULL;
+END
+$$ LANGUAGE plpgsql IMMUTABLE;
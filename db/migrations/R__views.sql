@@ -0,0 +1,41 @@
+-- Active and archived listings together, for training and reporting. The
+-- serving path keeps reading `listings`, which only holds active inventory
+-- and recently sold listings.
+CREATE OR REPLACE VIEW listings_all AS
+SELECT id, created_at, crawled_at, url, name, description, category, image,
+       sku, city, price, condition, seller_id, sold_at, price_new,
+       discount_ratio, is_pending_repricing, is_illiquid, is_invalid, embeddings,
+       false AS is_archived
+FROM listings
+UNION ALL
+SELECT id, created_at, crawled_at, url, name, description, category, image,
+       sku, city, price, condition, seller_id, sold_at, price_new,
+       discount_ratio, is_pending_repricing, is_illiquid, is_invalid, embeddings,
+       true AS is_archived
+FROM listings_archive;
+
+-- Active listings with their current model outputs, for the API.
+-- price_predicted follows a new price_new at once, without rescoring.
+CREATE OR REPLACE VIEW listings_scored AS
+SELECT l.id, l.created_at, l.crawled_at, l.url, l.name, l.description,
+       l.category, l.image, l.sku, l.city, l.price, l.condition, l.seller_id,
+       l.sold_at, l.price_new, l.discount_ratio, l.is_pending_repricing,
+       l.is_illiquid, l.is_invalid, l.embeddings,
+       r.value AS discount_ratio_predicted,
+       CASE WHEN l.price_new > 0 THEN l.price_new * r.value END AS price_predicted,
+       CAST(round(s.value) AS INTEGER) AS median_survival_days
+FROM listings l
+LEFT JOIN listing_predictions r
+  ON r.listing_id = l.id AND r.model_name = 'discount_ratio'
+LEFT JOIN listing_predictions s
+  ON s.listing_id = l.id AND s.model_name = 'median_survival_days';
+
+-- Embedding backlog by state, for the embedder log and monitoring:
+-- waiting (unclaimed or lease expired) and claimed (being encoded)
+CREATE OR REPLACE VIEW embedding_backlog AS
+SELECT count(*) FILTER (WHERE c.listing_id IS NULL OR c.claimed_until < (now() AT TIME ZONE 'utc')) AS waiting,
+       count(*) FILTER (WHERE c.claimed_until >= (now() AT TIME ZONE 'utc')) AS claimed,
+       count(*) FILTER (WHERE c.claimed_until < (now() AT TIME ZONE 'utc')) AS expired_claims
+FROM listings l
+LEFT JOIN embedding_claims c ON c.listing_id = l.id
+WHERE l.embeddings IS NULL;
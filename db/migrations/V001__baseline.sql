@@ -0,0 +1,95 @@
+-- Schema as it stood before migrations existed: what create_all and the
+-- crawler's ensure_schema used to build. Every statement is idempotent so
+-- the baseline also applies cleanly to databases created that way.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS listings (
+    id SERIAL PRIMARY KEY,
+    created_at TIMESTAMP,
+    raw_data JSONB
+);
+
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS url TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS crawled_at TIMESTAMP;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS name TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS description TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS category TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS image TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS sku TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS city TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS price INTEGER;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS condition TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS seller_id TEXT;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS sold_at TIMESTAMP;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS last_checked_at TIMESTAMP;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMP;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS price_new DOUBLE PRECISION;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS median_survival_days INTEGER;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS discount_ratio_predicted DOUBLE PRECISION;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS is_pending_repricing BOOLEAN DEFAULT false;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS is_illiquid BOOLEAN DEFAULT false;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS is_invalid BOOLEAN DEFAULT false;
+-- paraphrase-multilingual-mpnet-base-v2 vectors, written by the embedder
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS embeddings vector(768);
+-- Training target of the price model and the price shown by the API
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS discount_ratio DOUBLE PRECISION
+    GENERATED ALWAYS AS (CASE WHEN price_new > 0 THEN price / price_new END) STORED;
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS price_predicted DOUBLE PRECISION
+    GENERATED ALWAYS AS (CASE WHEN price_new > 0 THEN price_new * discount_ratio_predicted END) STORED;
+
+-- Fresh listings get their first sold check after two hours
+ALTER TABLE listings ALTER COLUMN next_check_at
+    SET DEFAULT (now() AT TIME ZONE 'utc') + interval '2 hours';
+
+-- The url unique index and the sold-check index are built CONCURRENTLY by
+-- V012, so applying the baseline never blocks writes to a live listings table
+
+CREATE TABLE IF NOT EXISTS category_watermarks (
+    category_url TEXT PRIMARY KEY,
+    newest_url TEXT,
+    next_page INTEGER,
+    pending_newest_url TEXT,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ceneo_price_cache (
+    query_key TEXT PRIMARY KEY,
+    offers JSONB NOT NULL,
+    fetched_at TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_ceneo_price_cache_expires_at
+    ON ceneo_price_cache (expires_at);
+
+CREATE TABLE IF NOT EXISTS price_lookups (
+    listing_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS price_lookups_due_idx
+    ON price_lookups (next_attempt_at)
+    WHERE next_attempt_at IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    queue TEXT NOT NULL,
+    dedupe_key TEXT,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    locked_by TEXT,
+    lease_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS jobs_queued_idx
+    ON jobs (queue, run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_running_idx
+    ON jobs (queue, lease_until) WHERE status = 'running';
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending_key_idx
+    ON jobs (queue, dedupe_key) WHERE status IN ('queued', 'running');
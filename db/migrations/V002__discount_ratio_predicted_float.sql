@@ -0,0 +1,11 @@
+-- Formerly ml/fix_schema.py: the price model writes fractional ratios
+DO $$
+BEGIN
+    IF (
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'listings' AND column_name = 'discount_ratio_predicted'
+    ) NOT IN ('double precision', 'real') THEN
+        ALTER TABLE listings ALTER COLUMN discount_ratio_predicted TYPE DOUBLE PRECISION
+            USING discount_ratio_predicted::double precision;
+    END IF;
+END $$;
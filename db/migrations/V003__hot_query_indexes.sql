@@ -0,0 +1,30 @@
+-- One index per hot query, built without blocking writes. Each predicate
+-- repeats the query's WHERE clause so the planner can match it.
+
+-- storage/repository.get_listings_without_new_price: unsold, no new price yet
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_price_new_missing_idx
+    ON listings (id)
+    WHERE sold_at IS NULL AND (price_new IS NULL OR price_new = -1);
+
+-- embedder: listings still waiting for a vector
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_embeddings_missing_idx
+    ON listings (id)
+    WHERE embeddings IS NULL;
+
+-- ml/modules/price_model.run_predictions: unsold listings with a vector.
+-- The training queries read most of the table and are left to seq scans.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_unsold_embedded_idx
+    ON listings (id)
+    WHERE sold_at IS NULL AND embeddings IS NOT NULL;
+
+-- api/database.get_listings and get_next_best: best deals first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_deals_idx
+    ON listings ((price_predicted - price) DESC)
+    WHERE sold_at IS NULL AND price_predicted > price
+    AND NOT is_illiquid AND is_pending_repricing = false;
+
+-- api/database.get_categories: deals grouped by category
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_category_deals_idx
+    ON listings (category)
+    INCLUDE (price, price_predicted, median_survival_days, created_at)
+    WHERE sold_at IS NULL AND price_predicted > price;
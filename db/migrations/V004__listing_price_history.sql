@@ -0,0 +1,49 @@
+-- Every price observation, appended by the crawler (source 'olx') and the
+-- Ceneo stage (source 'ceneo', the new-item price). Partitioned by month so
+-- old history is dropped by dropping partitions.
+CREATE TABLE IF NOT EXISTS listing_price_history (
+    listing_id INTEGER NOT NULL,
+    observed_at TIMESTAMP NOT NULL,
+    price DOUBLE PRECISION NOT NULL,
+    source TEXT NOT NULL
+) PARTITION BY RANGE (observed_at);
+
+CREATE INDEX IF NOT EXISTS listing_price_history_listing_idx
+    ON listing_price_history (listing_id, observed_at);
+
+-- Creates the partition holding `month`; safe to call concurrently
+CREATE OR REPLACE FUNCTION create_price_history_partition(month timestamp) RETURNS void AS $$
+DECLARE
+    start timestamp := date_trunc('month', month);
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF listing_price_history FOR VALUES FROM (%L) TO (%L)',
+        'listing_price_history_' || to_char(start, 'YYYY_MM'),
+        start,
+        start + interval '1 month'
+    );
+EXCEPTION WHEN duplicate_table THEN
+    NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Seed the history with the price each listing has now
+DO $$
+DECLARE
+    month timestamp;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', COALESCE(crawled_at, created_at))
+        FROM listings WHERE price IS NOT NULL
+        UNION
+        SELECT date_trunc('month', now() AT TIME ZONE 'utc')
+    LOOP
+        PERFORM create_price_history_partition(month);
+    END LOOP;
+END $$;
+
+INSERT INTO listing_price_history (listing_id, observed_at, price, source)
+SELECT id, COALESCE(crawled_at, created_at), price, 'olx'
+FROM listings
+WHERE price IS NOT NULL AND COALESCE(crawled_at, created_at) IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM listing_price_history);
@@ -0,0 +1,15 @@
+-- Cold storage for listings sold long ago, filled by the crawler's archive
+-- stage. Generated columns of listings become plain columns here, so rows
+-- keep the values they had when they were archived.
+CREATE TABLE IF NOT EXISTS listings_archive (LIKE listings INCLUDING DEFAULTS);
+ALTER TABLE listings_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS listings_archive_pkey_idx
+    ON listings_archive (id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS listings_archive_url_key
+    ON listings_archive (url);
+
+-- The archiver picks the oldest sold listings first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_sold_at_idx
+    ON listings (sold_at)
+    WHERE sold_at IS NOT NULL;
@@ -0,0 +1,34 @@
+-- Model outputs move out of listings into a narrow table, one row per
+-- listing and model, so hourly scoring rewrites small rows instead of wide
+-- listings rows carrying raw_data and an embedding. The free space left by
+-- fillfactor lets an updated row stay on its page (HOT update, no index
+-- writes). The API reads predictions through the listings_scored view.
+CREATE TABLE IF NOT EXISTS listing_predictions (
+    listing_id INTEGER NOT NULL,
+    -- 'discount_ratio' (price model) or 'median_survival_days' (survival model)
+    model_name TEXT NOT NULL,
+    -- Model file that produced `value`; unchanged values keep the older version
+    model_version TEXT NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    predicted_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (listing_id, model_name)
+) WITH (fillfactor = 70, autovacuum_vacuum_scale_factor = 0.05);
+
+INSERT INTO listing_predictions (listing_id, model_name, model_version, value, predicted_at)
+SELECT id, 'discount_ratio', 'listings', discount_ratio_predicted, now() AT TIME ZONE 'utc'
+FROM listings WHERE discount_ratio_predicted IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO listing_predictions (listing_id, model_name, model_version, value, predicted_at)
+SELECT id, 'median_survival_days', 'listings', median_survival_days, now() AT TIME ZONE 'utc'
+FROM listings WHERE median_survival_days IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+-- listings_all is recreated without these columns by R__views.sql; the
+-- indexes of V003 on price_predicted go with the column. Archived rows keep
+-- their last values in listings_archive.
+SET LOCAL lock_timeout = '10s';
+DROP VIEW IF EXISTS listings_all;
+ALTER TABLE listings DROP COLUMN IF EXISTS price_predicted;
+ALTER TABLE listings DROP COLUMN IF EXISTS discount_ratio_predicted;
+ALTER TABLE listings DROP COLUMN IF EXISTS median_survival_days;
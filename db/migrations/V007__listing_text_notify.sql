@@ -0,0 +1,42 @@
+-- Wakes the embedder as soon as a listing needs a vector: every inserted
+-- listing, and every listing whose name or description changes, is
+-- announced on the listing_text channel with its id as payload. A text
+-- change also clears the stale embedding. Notifications are delivered on
+-- commit; the embedder's slow poll picks up whatever it missed.
+CREATE OR REPLACE FUNCTION clear_stale_embedding() RETURNS trigger AS $$
+BEGIN
+    NEW.embeddings := NULL;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_listing_text() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('listing_text', NEW.id::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listings_text_changed_clear ON listings;
+CREATE TRIGGER listings_text_changed_clear
+    BEFORE UPDATE OF name, description ON listings
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name
+          OR OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE FUNCTION clear_stale_embedding();
+
+-- AFTER INSERT only fires for rows really inserted, not for upserts that
+-- turned into updates
+DROP TRIGGER IF EXISTS listings_inserted_notify ON listings;
+CREATE TRIGGER listings_inserted_notify
+    AFTER INSERT ON listings
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_listing_text();
+
+DROP TRIGGER IF EXISTS listings_text_changed_notify ON listings;
+CREATE TRIGGER listings_text_changed_notify
+    AFTER UPDATE OF name, description ON listings
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name
+          OR OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE FUNCTION notify_listing_text();
@@ -0,0 +1,41 @@
+-- Vectors by normalized listing text, so reposted listings and shared
+-- boilerplate are encoded once per model. listings.embedding_text_hash is
+-- the hash its current vector was made from; a text edit that leaves the
+-- normalized text unchanged keeps the vector.
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model_name TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding vector(768) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (model_name, text_hash)
+);
+
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS embedding_text_hash TEXT;
+
+-- The embedder reads the hash from here, so SQL and Python never disagree
+-- on the normalization: lowercased, whitespace collapsed, trimmed
+CREATE OR REPLACE FUNCTION listing_text_hash(name text, description text) RETURNS text AS $$
+    SELECT encode(sha256(convert_to(
+        lower(btrim(regexp_replace(concat_ws(' ', name, description), '\s+', ' ', 'g'))),
+        'UTF8'
+    )), 'hex')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION clear_stale_embedding() RETURNS trigger AS $$
+BEGIN
+    IF listing_text_hash(NEW.name, NEW.description) IS DISTINCT FROM NEW.embedding_text_hash THEN
+        NEW.embeddings := NULL;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+-- Only text changes that cleared the vector wake the embedder
+DROP TRIGGER IF EXISTS listings_text_changed_notify ON listings;
+CREATE TRIGGER listings_text_changed_notify
+    AFTER UPDATE OF name, description ON listings
+    FOR EACH ROW
+    WHEN ((OLD.name IS DISTINCT FROM NEW.name
+           OR OLD.description IS DISTINCT FROM NEW.description)
+          AND NEW.embeddings IS NULL)
+    EXECUTE FUNCTION notify_listing_text();
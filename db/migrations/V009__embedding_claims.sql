@@ -0,0 +1,12 @@
+-- Leases on listings waiting for a vector, so embedder replicas never
+-- encode the same listing twice. A replica claims rows with FOR UPDATE
+-- SKIP LOCKED and records the claim here, committed before it starts
+-- encoding; the claim is deleted with the vector stored. A claim past
+-- claimed_until belongs to a replica that crashed or stalled and may be
+-- taken over by any other.
+CREATE TABLE IF NOT EXISTS embedding_claims (
+    listing_id INTEGER PRIMARY KEY,
+    -- hostname:pid of the replica
+    claimed_by TEXT NOT NULL,
+    claimed_until TIMESTAMP NOT NULL
+) WITH (fillfactor = 70);
@@ -0,0 +1,28 @@
+-- Serving copy of the deal ranking. listings_scored computes price_predicted
+-- through two joins on listing_predictions, so ordering by the deal margin
+-- joined and sorted every active listing on each API page. listing_deals
+-- holds only unsold listings priced below their prediction, with the margin
+-- precomputed and indexed. It is refreshed after every scoring pass
+-- (ml/modules/predictions.refresh_deals); the API joins back to listings
+-- for the flags users change between refreshes (sold, illiquid, invalid,
+-- pending repricing).
+CREATE MATERIALIZED VIEW IF NOT EXISTS listing_deals AS
+SELECT l.id, l.category,
+       l.price_new * r.value AS price_predicted,
+       l.price_new * r.value - l.price AS price_difference,
+       CAST(round(s.value) AS INTEGER) AS median_survival_days
+FROM listings l
+JOIN listing_predictions r
+  ON r.listing_id = l.id AND r.model_name = 'discount_ratio'
+LEFT JOIN listing_predictions s
+  ON s.listing_id = l.id AND s.model_name = 'median_survival_days'
+WHERE l.sold_at IS NULL
+AND l.price_new > 0
+AND l.price_new * r.value > l.price;
+
+-- Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS listing_deals_id_idx ON listing_deals (id);
+
+-- api/database.get_listings, get_next_best: best deals first
+CREATE INDEX IF NOT EXISTS listing_deals_difference_idx
+    ON listing_deals (price_difference DESC);
@@ -0,0 +1,16 @@
+-- The embedder encodes the normalized text it caches by, so one cache key
+-- always stands for one model input. Before, the key was the hash of the
+-- normalized text but the raw, cased text was encoded, and the vector kept
+-- for a key depended on which variant was encoded first.
+CREATE OR REPLACE FUNCTION listing_text_normalized(name text, description text) RETURNS text AS $$
+    SELECT lower(btrim(regexp_replace(concat_ws(' ', name, description), '\s+', ' ', 'g')))
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Same hash as before, now spelled through listing_text_normalized
+CREATE OR REPLACE FUNCTION listing_text_hash(name text, description text) RETURNS text AS $$
+    SELECT encode(sha256(convert_to(listing_text_normalized(name, description), 'UTF8')), 'hex')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Cached vectors were made from raw text; drop them rather than mix them
+-- with vectors of normalized text. Listings keep their current vectors.
+TRUNCATE embedding_cache;
@@ -0,0 +1,21 @@
+-- Indexes on listings that predate migrations, built without blocking
+-- writes. Runs outside a transaction; an invalid index left by an
+-- interrupted build is dropped by migrate before the retry, so the
+-- dedupe below runs again and the build starts over.
+
+-- Listings are upserted by url; duplicates left by the old save path are
+-- removed (keeping the first row) before the unique index is built
+DO $$
+BEGIN
+    IF to_regclass('listings_url_key') IS NULL THEN
+        DELETE FROM listings a USING listings b
+        WHERE a.url = b.url AND a.id > b.id;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS listings_url_key
+    ON listings (url);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_sold_check_due_idx
+    ON listings (next_check_at NULLS FIRST)
+    WHERE sold_at IS NULL;
@@ -0,0 +1,146 @@
+"""
+Inference backends of the embedder, chosen with EMBED_BACKEND:
+
+    torch      SentenceTransformer.encode (default)
+    onnx       the model exported by export_onnx.py, run by ONNX Runtime
+    onnx-int8  the same with int8 dynamically quantized weights
+
+Every backend returns L2-normalized mean-pooled vectors. An ONNX variant is
+only loaded once export_onnx.py recorded it as passing the quality check
+against the PyTorch vectors in ONNX_MODEL_DIR/quality.json.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger("ml-worker")
+
+MODEL_NAME = "paraphrase-multilingual-mpnet-base-v2"
+BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "/app/models/onnx")
+# Inference threads per process; 0 leaves the library default
+THREADS = int(os.getenv("EMBED_THREADS", "0"))
+
+# File of each ONNX variant inside ONNX_MODEL_DIR
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+class TorchBackend:
+    name = "torch"
+    # Cache key of the vectors in embedding_cache
+    model_name = MODEL_NAME
+
+    def __init__(self, threads=THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(MODEL_NAME, device="cpu")
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=True
+        )
+
+
+class OnnxBackend:
+    def __init__(
+        self, name, model_dir=ONNX_MODEL_DIR, max_seq_length=None, threads=THREADS
+    ):
+        """
+        `max_seq_length` is only passed by export_onnx.py, to load a variant
+        it is still checking; otherwise the variant must have passed.
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.name = name
+        # Only checked against torch to the quality.json thresholds, so each
+        # variant's vectors are cached apart from torch's and each other's
+        self.model_name = f"{MODEL_NAME}:{name}"
+        if max_seq_length is None:
+            max_seq_length = self.check_quality(name, model_dir)
+        self.max_seq_length = max_seq_length
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_FILES[name]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        # last_hidden_state is (batch, sequence, hidden); only the first two
+        # axes are dynamic in export_onnx.py
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    @staticmethod
+    def check_quality(name, model_dir):
+        with open(os.path.join(model_dir, "quality.json")) as f:
+            quality = json.load(f)
+        check = quality["variants"].get(name)
+        if not check or not check["passed"]:
+            raise RuntimeError(
+                f"{name} did not pass the quality check in {model_dir}/quality.json; "
+                f"run export_onnx.py or use EMBED_BACKEND=torch"
+            )
+        logger.info(
+            f"{name}: mean cosine {check['mean_cosine']:.4f}, "
+            f"min {check['min_cosine']:.4f} against torch"
+        )
+        return quality["max_seq_length"]
+
+    def encode(self, texts, batch_size=32):
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            mask = tokens["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                None,
+                {
+                    "input_ids": tokens["input_ids"].astype(np.int64),
+                    "attention_mask": mask,
+                },
+            )[0]
+            # Mean pooling over the real tokens, as the sentence-transformers model does
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(
+                weights.sum(axis=1), 1e-9, None
+            )
+            norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled / norms)
+        return (
+            np.vstack(vectors) if vectors else np.zeros((0, self.dimension), np.float32)
+        )
+
+
+def load_backend(name=BACKEND, threads=THREADS):
+    logger.info(f"Loading {MODEL_NAME} with the {name} backend")
+    if name == "torch":
+        return TorchBackend(threads=threads)
+    if name in ONNX_FILES:
+        return OnnxBackend(name, threads=threads)
+    raise ValueError(f"unknown EMBED_BACKEND {name!r}: torch, onnx or onnx-int8")
+
+
+def load_tokenizer(name=BACKEND):
+    """The tokenizer of a backend, without loading its model."""
+    from transformers import AutoTokenizer
+
+    if name == "torch":
+        return AutoTokenizer.from_pretrained(f"sentence-transformers/{MODEL_NAME}")
+    return AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
@@ -0,0 +1,105 @@
+"""
+Encoding throughput of each backend on the fixed local corpus:
+
+    python embedder/benchmark.py [--backends torch onnx onnx-int8] [--repeat 5] [--batch-size 32]
+
+Each backend runs in its own subprocess, so the peak RSS reported is that
+backend's alone. Prints one line per backend and, with --json, the results
+as JSON.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+CORPUS = os.path.join(os.path.dirname(__file__), "benchmark_corpus.txt")
+
+
+def read_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run(backend_name, corpus_path, repeat, batch_size):
+    """Measures one backend in this process; prints its result as JSON."""
+    from backends import load_backend
+
+    texts = read_corpus(corpus_path)
+    start = time.monotonic()
+    backend = load_backend(backend_name)
+    load_seconds = time.monotonic() - start
+    # Warm-up: first calls allocate buffers and pick kernels
+    backend.encode(texts[:batch_size], batch_size=batch_size)
+
+    start = time.monotonic()
+    for _ in range(repeat):
+        backend.encode(texts, batch_size=batch_size)
+    seconds = time.monotonic() - start
+    print(
+        json.dumps(
+            {
+                "backend": backend_name,
+                "sentences": len(texts) * repeat,
+                "sentences_per_second": round(len(texts) * repeat / seconds, 1),
+                "load_seconds": round(load_seconds, 1),
+                # ru_maxrss is in KiB on Linux
+                "peak_rss_mb": round(
+                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                ),
+            }
+        )
+    )
+
+
+def benchmark(backends, corpus_path, repeat, batch_size):
+    results = []
+    for name in backends:
+        process = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--run",
+                name,
+                "--corpus",
+                corpus_path,
+                "--repeat",
+                str(repeat),
+                "--batch-size",
+                str(batch_size),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            print(f"{name}: failed\n{process.stderr.strip()}", file=sys.stderr)
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(
+            f"{name:<10} {result['sentences_per_second']:>8.1f} sentences/s  "
+            f"peak RSS {result['peak_rss_mb']:>5} MB  "
+            f"(load {result['load_seconds']}s)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.corpus, args.repeat, args.batch_size)
+    else:
+        results = benchmark(args.backends, args.corpus, args.repeat, args.batch_size)
+        if args.json:
+            print(json.dumps(results, indent=2))
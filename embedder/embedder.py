@@ -1,9 +1,14 @@
 import os
+import json
+import select
+import socket
 import time
 import logging
+from concurrent.futures.process import BrokenProcessPool
 import psycopg2
 from psycopg2.extras import execute_values
-from sentence_transformers import SentenceTransformer
+
+from encoding import Encoder
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -11,74 +16,335 @@ logger = logging.getLogger("ml-worker")
 
 # Configuration
 DB_URL = os.getenv("DATABASE_URL", "postgres://postgres:password@db:5432/pricer")
-MODEL_NAME = "paraphrase-multilingual-mpnet-base-v2"
-BATCH_SIZE = 50
+BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "50"))
+# Listings fetched per backlog query; encoding.Encoder splits them into
+# batches of similar token length
+WINDOW = int(os.getenv("EMBED_WINDOW", "1000"))
+# Notified listings are encoded once BATCH_SIZE are waiting or the oldest
+# has waited FLUSH_SECONDS
+FLUSH_SECONDS = float(os.getenv("EMBED_FLUSH_SECONDS", "1"))
+# Safety net for notifications missed while disconnected
+POLL_SECONDS = float(os.getenv("EMBED_POLL_SECONDS", "300"))
+# Channel of the listings triggers (db/migrations/V007__listing_text_notify.sql)
+CHANNEL = "listing_text"
+# Seconds a replica may hold its claimed listings (V009__embedding_claims.sql);
+# must exceed the time to encode a WINDOW
+LEASE_SECONDS = int(os.getenv("EMBED_LEASE_SECONDS", "600"))
+REPLICA = f"{socket.gethostname()}:{os.getpid()}"
+# Cached vectors no listing uses any more are deleted this many days after
+# they were made, checked at most every CACHE_PURGE_SECONDS
+CACHE_RETENTION_DAYS = int(os.getenv("EMBED_CACHE_RETENTION_DAYS", "30"))
+CACHE_PURGE_SECONDS = float(os.getenv("EMBED_CACHE_PURGE_SECONDS", "3600"))
+# Cumulative cache statistics, rewritten after every batch
+STATS_FILE = os.getenv("EMBED_STATS_FILE", "/tmp/embedder_stats.json")
 
-# Initialize Model (This will now load from the local cache)
-logger.info(f"Loading model: {MODEL_NAME}")
-model = SentenceTransformer(MODEL_NAME)
+# Loaded in __main__ (the model loads from the local cache): spawned encoder
+# workers import this module too. EMBED_BACKEND picks torch or an exported
+# ONNX variant, see backends.py
+encoder = None
 
 
 def get_connection():
     return psycopg2.connect(DB_URL)
 
 
+class CacheStats:
+    """Embedding cache counters since start, logged and written to STATS_FILE."""
+
+    def __init__(self):
+        self.listings = 0
+        self.hits = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        # Last embedding_backlog reading
+        self.backlog = None
+
+    def record(self, listings, encoded, encode_seconds):
+        self.listings += listings
+        self.hits += listings - encoded
+        self.encoded += encoded
+        self.encode_seconds += encode_seconds
+
+    def snapshot(self):
+        per_text = self.encode_seconds / self.encoded if self.encoded else 0.0
+        return {
+            "model_name": encoder.model_name,
+            "listings": self.listings,
+            "cache_hits": self.hits,
+            "encoded": self.encoded,
+            "hit_rate": round(self.hits / self.listings, 4) if self.listings else 0.0,
+            "encode_seconds": round(self.encode_seconds, 1),
+            "saved_seconds_estimate": round(self.hits * per_text, 1),
+            "buckets": encoder.stats.snapshot(),
+            "backlog": self.backlog,
+        }
+
+    def export(self):
+        snapshot = self.snapshot()
+        try:
+            with open(STATS_FILE, "w") as f:
+                json.dump(snapshot, f)
+        except OSError as e:
+            logger.warning(f"Could not write {STATS_FILE}: {e}")
+        return snapshot
+
+
+stats = CacheStats()
+
+# Listings to embed, with their normalized text and its hash. The model is
+# fed exactly the text the cache key is made from.
+SELECT_LISTINGS = """
+    SELECT id, listing_text_hash(name, description),
+           listing_text_normalized(name, description)
+    FROM listings
+"""
+
+
+def embed_rows(cur, rows):
+    """
+    Stores vectors for (id, text_hash, normalized_text) rows. Texts whose
+    hash is in embedding_cache are not encoded again; the others are encoded
+    once per distinct hash and added to the cache.
+    """
+    hashes = {row[1] for row in rows}
+    cur.execute(
+        """
+        SELECT text_hash FROM embedding_cache
+        WHERE model_name = %s AND text_hash = ANY(%s)
+    """,
+        (encoder.model_name, list(hashes)),
+    )
+    cached = {text_hash for (text_hash,) in cur.fetchall()}
+
+    misses = {row[1]: row[2] for row in rows if row[1] not in cached}
+    start = time.monotonic()
+    if misses:
+        logger.info(f"Encoding {len(misses)} texts for {len(rows)} listings...")
+        embeddings = encoder.encode(list(misses.values()))
+        execute_values(
+            cur,
+            """
+            INSERT INTO embedding_cache (model_name, text_hash, embedding)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+        """,
+            [
+                (encoder.model_name, text_hash, vector.tolist())
+                for text_hash, vector in zip(misses, embeddings)
+            ],
+        )
+    stats.record(len(rows), len(misses), time.monotonic() - start)
+
+    # A listing whose text changed since it was read no longer matches its
+    # hash and keeps its NULL vector; its change notification brings it back
+    execute_values(
+        cur,
+        """
+        UPDATE listings
+        SET embeddings = c.embedding, embedding_text_hash = c.text_hash
+        FROM (VALUES %s) AS v(id, model_name, text_hash)
+        JOIN embedding_cache c
+          ON c.model_name = v.model_name AND c.text_hash = v.text_hash
+        WHERE listings.id = v.id
+        AND listing_text_hash(listings.name, listings.description) = v.text_hash
+    """,
+        [(row[0], encoder.model_name, row[1]) for row in rows],
+    )
+    snapshot = stats.export()
+    logger.info(
+        f"Cache hit rate {snapshot['hit_rate']:.1%} "
+        f"({snapshot['cache_hits']} of {snapshot['listings']} listings), "
+        f"~{snapshot['saved_seconds_estimate']}s of encoding saved"
+    )
+    return len(rows)
+
+
+def claim(conn, where, params):
+    """
+    Leases listings without a vector that match `where` and no other replica
+    holds, and commits the lease. Rows locked by another replica's claim are
+    skipped rather than waited for; a lease past claimed_until is taken over.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH candidates AS (
+                SELECT l.id FROM listings l
+                LEFT JOIN embedding_claims c ON c.listing_id = l.id
+                WHERE l.embeddings IS NULL
+                AND (c.listing_id IS NULL OR c.claimed_until < (now() AT TIME ZONE 'utc'))
+                AND {where}
+                ORDER BY l.id
+                LIMIT %(limit)s
+                FOR UPDATE OF l SKIP LOCKED
+            )
+            INSERT INTO embedding_claims (listing_id, claimed_by, claimed_until)
+            SELECT id, %(replica)s, (now() AT TIME ZONE 'utc') + make_interval(secs => %(lease)s)
+            FROM candidates
+            ON CONFLICT (listing_id) DO UPDATE
+            SET claimed_by = EXCLUDED.claimed_by,
+                claimed_until = EXCLUDED.claimed_until
+            WHERE embedding_claims.claimed_until < (now() AT TIME ZONE 'utc')
+            RETURNING listing_id
+        """,
+            {**params, "replica": REPLICA, "lease": LEASE_SECONDS},
+        )
+        ids = [listing_id for (listing_id,) in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def embed_claimed(conn, ids):
+    """Embeds the claimed listings `ids` and releases their claims."""
+    with conn.cursor() as cur:
+        cur.execute(
+            SELECT_LISTINGS + "WHERE id = ANY(%s) AND embeddings IS NULL",
+            (ids,),
+        )
+        rows = cur.fetchall()
+        processed = embed_rows(cur, rows) if rows else 0
+        cur.execute(
+            "DELETE FROM embedding_claims WHERE listing_id = ANY(%s) AND claimed_by = %s",
+            (ids, REPLICA),
+        )
+    conn.commit()
+    return processed
+
+
 def process_undone_listings():
+    """Claims and embeds up to WINDOW listings; returns how many were claimed."""
+    with get_connection() as conn:
+        ids = claim(conn, "true", {"limit": WINDOW})
+        if ids:
+            embed_claimed(conn, ids)
+        return len(ids)
+
+
+def process_listings(ids):
+    """
+    Embeds the listings among `ids` that still have no vector. Every replica
+    is notified of every listing; only the one that claims it embeds it.
+    """
+    with get_connection() as conn:
+        claimed = claim(
+            conn, "l.id = ANY(%(ids)s)", {"ids": list(ids), "limit": len(ids)}
+        )
+        return embed_claimed(conn, claimed) if claimed else 0
+
+
+def record_backlog():
     with get_connection() as conn:
         with conn.cursor() as cur:
-            # 1. Fetch listings that need vectors
             cur.execute(
-                """
-                SELECT id, name, description 
-                FROM listings 
-                WHERE embeddings IS NULL
-                LIMIT %s
-            """,
-                (BATCH_SIZE,),
+                "SELECT waiting, claimed, expired_claims FROM embedding_backlog"
             )
-            rows = cur.fetchall()
-
-            if not rows:
-                return 0
+            waiting, claimed, expired = cur.fetchone()
+    stats.backlog = {"waiting": waiting, "claimed": claimed, "expired_claims": expired}
+    stats.export()
+    logger.info(
+        f"Backlog: {waiting} listings waiting ({expired} with expired claims), "
+        f"{claimed} claimed by replicas."
+    )
 
-            # 2. Prepare text (Combining Title + Description for better context)
-            ids = [row[0] for row in rows]
-            # We clean None values to empty strings to avoid errors
-            texts = [f"{row[1] or ''} {row[2] or ''}".strip() for row in rows]
 
-            # 3. Generate Embeddings
-            logger.info(f"Encoding batch of {len(texts)} listings...")
-            embeddings = model.encode(texts, normalize_embeddings=True)
+last_cache_purge = float("-inf")
 
-            # 4. Bulk Update using pgvector-friendly format
-            # We convert numpy array to list for psycopg2
-            data_to_update = [(embeddings[i].tolist(), ids[i]) for i in range(len(ids))]
 
-            execute_values(
-                cur,
+def purge_cache():
+    """
+    Deletes cached vectors older than CACHE_RETENTION_DAYS that no listing
+    was embedded from, including those of models no longer in use.
+    """
+    global last_cache_purge
+    if time.monotonic() - last_cache_purge < CACHE_PURGE_SECONDS:
+        return
+    last_cache_purge = time.monotonic()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
                 """
-                UPDATE listings SET embeddings = v.vec
-                FROM (VALUES %s) AS v(vec, id)
-                WHERE listings.id = v.id
+                DELETE FROM embedding_cache c
+                WHERE c.created_at < (now() AT TIME ZONE 'utc') - make_interval(days => %s)
+                AND NOT EXISTS (
+                    SELECT 1 FROM listings l WHERE l.embedding_text_hash = c.text_hash
+                )
             """,
-                data_to_update,
+                (CACHE_RETENTION_DAYS,),
             )
+            deleted = cur.rowcount
+    if deleted:
+        logger.info(f"Purged {deleted} unused cached vectors.")
+
+
+def process_backlog():
+    """Works through every listing without a vector not claimed elsewhere."""
+    total = 0
+    while claimed := process_undone_listings():
+        total += claimed
+    if total:
+        logger.info(f"Poll claimed {total} listings.")
+    record_backlog()
+    purge_cache()
 
-            conn.commit()
-            return len(ids)
+
+def listen():
+    """
+    Embeds listings as their notifications arrive, in micro-batches of up to
+    BATCH_SIZE ids, and polls for the backlog every POLL_SECONDS.
+    """
+    conn = get_connection()
+    conn.autocommit = True
+    try:
+        conn.cursor().execute(f"LISTEN {CHANNEL}")
+        logger.info(f"Listening on {CHANNEL}")
+        # The backlog is polled right away: notifications sent while we were
+        # away are lost
+        pending, first_pending, last_poll = set(), None, float("-inf")
+        while True:
+            now = time.monotonic()
+            if now - last_poll >= POLL_SECONDS:
+                process_backlog()
+                pending, first_pending, last_poll = set(), None, time.monotonic()
+                continue
+
+            timeout = last_poll + POLL_SECONDS - now
+            if pending:
+                timeout = min(timeout, first_pending + FLUSH_SECONDS - now)
+            if select.select([conn], [], [], max(timeout, 0)) != ([], [], []):
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    if not pending:
+                        first_pending = time.monotonic()
+                    pending.add(int(notify.payload))
+
+            if pending and (
+                len(pending) >= BATCH_SIZE
+                or time.monotonic() - first_pending >= FLUSH_SECONDS
+            ):
+                batch = list(pending)[:BATCH_SIZE]
+                pending.difference_update(batch)
+                first_pending = time.monotonic() if pending else None
+                processed = process_listings(batch)
+                logger.info(
+                    f"Embedded {processed} of {len(batch)} notified listings, "
+                    f"{len(pending)} waiting."
+                )
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
+    encoder = Encoder()
     logger.info("Worker started. Waiting for new listings...")
     while True:
         try:
-            processed_count = process_undone_listings()
-            if processed_count > 0:
-                logger.info(f"Successfully processed {processed_count} listings.")
-            else:
-                # Idle: wait a bit before checking again
-                time.sleep(300)
-
+            listen()
+        except BrokenProcessPool as e:
+            # A worker died mid-batch; its claims expire and are taken over
+            logger.error(f"Encoder pool broke, restarting it: {e}")
+            encoder.close()
+            encoder = Encoder()
         except Exception as e:
             logger.error(f"Error in worker loop: {e}")
-            time.sleep(300)  # Wait before retry
+            time.sleep(5)  # Wait before reconnecting
@@ -0,0 +1,218 @@
+"""
+Encodes texts in batches of similar token length, on this process or on a
+pool of worker processes with one model replica each.
+
+Texts are bucketed by token length (BUCKETS, capped at the model's
+max_seq_length) so a short title is never padded to the length of a long
+description. The batch size of a bucket follows from two budgets:
+
+    EMBED_TOKEN_BUDGET    padded tokens per batch, which bounds activation memory
+    EMBED_BATCH_SECONDS   target seconds per batch, from the measured speed
+                          of the bucket
+
+and is capped at EMBED_MAX_BATCH. With EMBED_WORKERS > 1 each worker is
+pinned to its own share of the CPUs and gets that many inference threads.
+A worker that dies mid-batch breaks the pool: encode() raises
+BrokenProcessPool and the caller builds a new Encoder.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from backends import BACKEND, load_backend, load_tokenizer
+
+logger = logging.getLogger("ml-worker")
+
+WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "8192"))
+BATCH_SECONDS = float(os.getenv("EMBED_BATCH_SECONDS", "2"))
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))
+# Upper token length of each bucket
+BUCKETS = (16, 32, 64, 128, 256, 512)
+
+
+def bucket_of(length, max_seq_length):
+    for bound in BUCKETS:
+        if length <= bound:
+            return min(bound, max_seq_length)
+    return max_seq_length
+
+
+class BucketStats:
+    """Throughput of each bucket since start."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def record(self, bucket, texts, padded_tokens, seconds):
+        entry = self.buckets.setdefault(
+            bucket, {"texts": 0, "batches": 0, "padded_tokens": 0, "seconds": 0.0}
+        )
+        entry["texts"] += texts
+        entry["batches"] += 1
+        entry["padded_tokens"] += padded_tokens
+        entry["seconds"] += seconds
+
+    def seconds_per_token(self, bucket):
+        entry = self.buckets.get(bucket)
+        if not entry or not entry["padded_tokens"]:
+            return None
+        return entry["seconds"] / entry["padded_tokens"]
+
+    def snapshot(self):
+        return {
+            str(bucket): {
+                "texts": entry["texts"],
+                "batches": entry["batches"],
+                "texts_per_second": round(entry["texts"] / entry["seconds"], 1),
+                "tokens_per_second": round(entry["padded_tokens"] / entry["seconds"]),
+            }
+            for bucket, entry in sorted(self.buckets.items())
+            if entry["seconds"]
+        }
+
+
+# Model replica of a worker process
+worker_backend = None
+
+
+def init_worker(backend_name, cpu_groups):
+    global worker_backend
+    logging.basicConfig(level=logging.INFO)
+    # The pool never starts more than one process per group: a dead worker
+    # breaks it rather than being replaced
+    cpus = cpu_groups.get()
+    os.sched_setaffinity(0, cpus)
+    worker_backend = load_backend(backend_name, threads=len(cpus))
+    logger.info(f"Encoder worker {os.getpid()} on CPUs {sorted(cpus)}")
+
+
+def describe_worker():
+    return (
+        worker_backend.model_name,
+        worker_backend.max_seq_length,
+        worker_backend.dimension,
+    )
+
+
+def encode_batch(job):
+    """Encodes one planned batch on the worker's replica."""
+    bucket, indices, texts = job
+    start = time.monotonic()
+    vectors = worker_backend.encode(texts, batch_size=len(texts))
+    return bucket, indices, vectors, time.monotonic() - start
+
+
+def split_cpus(workers):
+    cpus = sorted(os.sched_getaffinity(0))
+    if workers > len(cpus):
+        raise ValueError(f"EMBED_WORKERS={workers} but only {len(cpus)} CPUs")
+    size = len(cpus) // workers
+    return [set(cpus[i * size : (i + 1) * size]) for i in range(workers)]
+
+
+class Encoder:
+    def __init__(self, backend_name=BACKEND, workers=WORKERS):
+        self.stats = BucketStats()
+        self.pool = None
+        if workers <= 1:
+            self.backend = load_backend(backend_name)
+            self.tokenizer = self.backend.tokenizer
+            self.model_name = self.backend.model_name
+            self.max_seq_length = self.backend.max_seq_length
+            self.dimension = self.backend.dimension
+            return
+
+        # spawn: the model libraries' threads do not survive a fork
+        context = multiprocessing.get_context("spawn")
+        cpu_groups = context.Queue()
+        for cpus in split_cpus(workers):
+            cpu_groups.put(cpus)
+        self.pool = ProcessPoolExecutor(
+            workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(backend_name, cpu_groups),
+        )
+        self.tokenizer = load_tokenizer(backend_name)
+        self.model_name, self.max_seq_length, self.dimension = self.pool.submit(
+            describe_worker
+        ).result()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+    def token_lengths(self, texts):
+        ids = self.tokenizer(texts, truncation=True, max_length=self.max_seq_length)[
+            "input_ids"
+        ]
+        return [len(tokens) for tokens in ids]
+
+    def batch_size(self, bucket):
+        size = TOKEN_BUDGET // bucket
+        seconds_per_token = self.stats.seconds_per_token(bucket)
+        if seconds_per_token:
+            size = min(size, int(BATCH_SECONDS / (seconds_per_token * bucket)))
+        return max(1, min(size, MAX_BATCH))
+
+    def plan(self, texts):
+        """(bucket, indices, padded_tokens) batches, each sorted by token length."""
+        lengths = self.token_lengths(texts)
+        buckets = {}
+        for i in sorted(range(len(texts)), key=lengths.__getitem__):
+            buckets.setdefault(bucket_of(lengths[i], self.max_seq_length), []).append(i)
+        batches = []
+        for bucket, indices in sorted(buckets.items()):
+            size = self.batch_size(bucket)
+            for start in range(0, len(indices), size):
+                batch = indices[start : start + size]
+                # Sorted, so the last text sets the padded length
+                batches.append((bucket, batch, lengths[batch[-1]] * len(batch)))
+        return batches
+
+    def encode(self, texts):
+        """L2-normalized vectors of `texts`, in the same order."""
+        if not texts:
+            return np.zeros((0, self.dimension), np.float32)
+        batches = self.plan(texts)
+        padded = {tuple(indices): tokens for _, indices, tokens in batches}
+        jobs = [
+            (bucket, indices, [texts[i] for i in indices])
+            for bucket, indices, _ in batches
+        ]
+        if self.pool:
+            futures = [self.pool.submit(encode_batch, job) for job in jobs]
+            results = (future.result() for future in as_completed(futures))
+        else:
+            results = (self.encode_local(job) for job in jobs)
+
+        vectors = [None] * len(texts)
+        counts = {}
+        for bucket, indices, batch_vectors, seconds in results:
+            for i, vector in zip(indices, batch_vectors):
+                vectors[i] = vector
+            self.stats.record(bucket, len(indices), padded[tuple(indices)], seconds)
+            counts[bucket] = counts.get(bucket, 0) + len(indices)
+
+        snapshot = self.stats.snapshot()
+        for bucket, count in sorted(counts.items()):
+            entry = snapshot[str(bucket)]
+            logger.info(
+                f"Bucket <={bucket} tokens: {count} texts "
+                f"(batch size {self.batch_size(bucket)}), since start "
+                f"{entry['texts_per_second']} texts/s, "
+                f"{entry['tokens_per_second']} padded tokens/s"
+            )
+        return np.vstack(vectors)
+
+    def encode_local(self, job):
+        bucket, indices, texts = job
+        start = time.monotonic()
+        vectors = self.backend.encode(texts, batch_size=len(texts))
+        return bucket, indices, vectors, time.monotonic() - start
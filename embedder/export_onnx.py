@@ -0,0 +1,123 @@
+"""
+Exports the embedding model to ONNX, quantizes a copy to int8 and checks
+both against the PyTorch vectors on the benchmark corpus:
+
+    python embedder/export_onnx.py [--out /app/models/onnx] [--min-mean 0.99] [--min-cosine 0.95]
+
+Writes model.onnx, model.int8.onnx, the tokenizer and quality.json, which
+records the cosine agreement of each variant and whether it passed.
+backends.OnnxBackend refuses a variant that did not pass.
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+
+from backends import MODEL_NAME, ONNX_FILES, ONNX_MODEL_DIR, OnnxBackend, TorchBackend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ml-worker")
+
+CORPUS = os.path.join(os.path.dirname(__file__), "benchmark_corpus.txt")
+
+
+class Encoder(torch.nn.Module):
+    """The transformer without pooling; pooling runs outside the graph."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+
+def export(reference, out):
+    os.makedirs(out, exist_ok=True)
+    encoder = Encoder(reference.model[0].auto_model).eval()
+    sample = reference.tokenizer(["przykładowe ogłoszenie"], return_tensors="pt")
+    path = os.path.join(out, ONNX_FILES["onnx"])
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=14,
+        )
+    reference.tokenizer.save_pretrained(out)
+    logger.info(f"Exported {path}")
+
+
+def quantize(out):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = os.path.join(out, ONNX_FILES["onnx-int8"])
+    quantize_dynamic(
+        os.path.join(out, ONNX_FILES["onnx"]), path, weight_type=QuantType.QInt8
+    )
+    logger.info(f"Quantized {path}")
+
+
+def agreement(expected, actual):
+    """Cosine of each pair of normalized vectors."""
+    return np.sum(np.asarray(expected) * np.asarray(actual), axis=1)
+
+
+def write_quality(out, max_seq_length, variants):
+    with open(os.path.join(out, "quality.json"), "w") as f:
+        json.dump(
+            {
+                "model_name": MODEL_NAME,
+                "max_seq_length": max_seq_length,
+                "variants": variants,
+            },
+            f,
+            indent=2,
+        )
+
+
+def check(reference, out, texts, min_mean, min_cosine):
+    expected = reference.encode(texts)
+    variants = {}
+    for name in ONNX_FILES:
+        backend = OnnxBackend(name, out, reference.max_seq_length)
+        cosines = agreement(expected, backend.encode(texts))
+        variants[name] = {
+            "mean_cosine": round(float(cosines.mean()), 5),
+            "min_cosine": round(float(cosines.min()), 5),
+            "passed": bool(cosines.mean() >= min_mean and cosines.min() >= min_cosine),
+        }
+        logger.info(f"{name}: {variants[name]}")
+    write_quality(out, reference.max_seq_length, variants)
+    return variants
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--min-mean", type=float, default=0.99)
+    parser.add_argument("--min-cosine", type=float, default=0.95)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    reference = TorchBackend()
+    export(reference, args.out)
+    quantize(args.out)
+    variants = check(reference, args.out, texts, args.min_mean, args.min_cosine)
+    failed = [name for name, result in variants.items() if not result["passed"]]
+    if failed:
+        raise SystemExit(f"quality check failed for {', '.join(failed)}")
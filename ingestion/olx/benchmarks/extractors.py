@@ -0,0 +1,42 @@
+"""
+Times every declared extractor on the saved listing fixtures, so a selector
+change can be checked offline before it ships.
+
+Run from ingestion/olx with the crawler environment:
+
+    python -m benchmarks.extractors [--repeat 20]
+"""
+
+import argparse, asyncio, json
+from playwright.async_api import async_playwright
+from crawler.extract import EXTRACTORS
+from benchmarks.listing_parse import FIXTURES_DIR, load_fixtures
+
+
+async def run(repeat):
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"No fixtures in {FIXTURES_DIR}; record some with listing_parse save.")
+        return
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(java_script_enabled=False)
+        await context.route("**/*", lambda route: route.abort())
+        page = await context.new_page()
+        for url, html in fixtures:
+            await page.set_content(html, wait_until="domcontentloaded")
+            for extractor in EXTRACTORS:
+                for _ in range(repeat):
+                    result = await extractor(page)
+                filled = sum(1 for value in result.values() if value)
+                print(f"{extractor.name:<16} {filled}/{len(result)} fields  {url}")
+        await browser.close()
+
+    print(json.dumps({e.name: e.stats() for e in EXTRACTORS}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args().repeat))
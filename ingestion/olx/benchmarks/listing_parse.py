@@ -0,0 +1,128 @@
+"""
+Side-by-side benchmark of the HTTP fast path parser and the Playwright path
+on saved listing pages.
+
+Run from ingestion/olx with the crawler environment:
+
+    python -m benchmarks.listing_parse save https://www.olx.pl/d/oferta/... [...]
+    python -m benchmarks.listing_parse run [--repeat 20]
+"""
+
+import argparse, asyncio, hashlib, os, resource, statistics, time
+from playwright.async_api import async_playwright
+from crawler.http_client import new_http_client
+from crawler.listing_http import parse_listing_html
+from crawler.listing_page import read_listing_details
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+CHUNK_SIZE = 16 * 1024
+
+
+def load_fixtures():
+    fixtures = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            url, html = f.read().split("\n", 1)
+        fixtures.append((url.removeprefix("<!-- ").removesuffix(" -->"), html))
+    return fixtures
+
+
+async def save(urls):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    async with new_http_client() as client:
+        for url in urls:
+            resp = await client.get(url)
+            resp.raise_for_status()
+            name = hashlib.sha1(url.encode()).hexdigest()[:12] + ".html"
+            with open(os.path.join(FIXTURES_DIR, name), "w", encoding="utf-8") as f:
+                f.write(f"<!-- {url} -->\n{resp.text}")
+            print(f"saved {url} -> {name}")
+
+
+def chunks(html):
+    return (html[i : i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+
+
+def bench_http(fixtures, repeat):
+    timings, results = [], {}
+    for url, html in fixtures:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[url] = parse_listing_html(url, chunks(html))
+            timings.append(time.perf_counter() - start)
+    return timings, results
+
+
+async def bench_playwright(fixtures, repeat):
+    timings, results = [], {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(java_script_enabled=False)
+        # Keep the comparison offline: only the saved document is loaded
+        await context.route("**/*", lambda route: route.abort())
+        page = await context.new_page()
+        for url, html in fixtures:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await page.set_content(html, wait_until="domcontentloaded")
+                results[url] = await read_listing_details(page, url)
+                timings.append(time.perf_counter() - start)
+        await browser.close()
+    return timings, results
+
+
+def report(label, timings):
+    ms = [t * 1000 for t in timings]
+    print(
+        f"{label:<12} n={len(ms):<5} mean={statistics.mean(ms):8.2f}ms "
+        f"p50={statistics.median(ms):8.2f}ms max={max(ms):8.2f}ms "
+        f"listings/s={1000 / statistics.mean(ms):8.1f}"
+    )
+
+
+def compare(http_results, pw_results):
+    mismatches = 0
+    for url, expected in pw_results.items():
+        got = http_results.get(url, {})
+        for key, value in expected.items():
+            if key != "crawled_at" and got.get(key) != value:
+                mismatches += 1
+                print(
+                    f"mismatch {url} {key}: http={got.get(key)!r} playwright={value!r}"
+                )
+    print(f"field mismatches: {mismatches}")
+
+
+async def run(repeat):
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"No fixtures in {FIXTURES_DIR}; record some with `save` first.")
+        return
+    print(f"{len(fixtures)} fixtures, {repeat} repeats each")
+
+    http_timings, http_results = bench_http(fixtures, repeat)
+    rss_http = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    pw_timings, pw_results = await bench_playwright(fixtures, repeat)
+    rss_browser = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    report("http", http_timings)
+    report("playwright", pw_timings)
+    print(f"peak RSS: python={rss_http:.0f}MB browser child={rss_browser:.0f}MB")
+    compare(http_results, pw_results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    save_cmd = sub.add_parser("save", help="download listing pages as fixtures")
+    save_cmd.add_argument("urls", nargs="+")
+    run_cmd = sub.add_parser("run", help="benchmark both parsers on the fixtures")
+    run_cmd.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "save":
+        asyncio.run(save(args.urls))
+    else:
+        asyncio.run(run(args.repeat))
@@ -5,5 +5,85 @@ OLX_URLS = [
     for category in os.getenv("OLX_START_URL").split(",")
 ]
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Connection pool of the process; the async pool is shared by all coroutines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 HEARTBEAT_FILE = "/tmp/crawler_heartbeat"
 USER_AGENT = "Mozilla/5.0 ..."
+
+# Number of Playwright pages crawling listing details in parallel
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "4"))
+
+# Request rates in requests per second; hosts are matched by domain suffix
+CRAWL_GLOBAL_RATE = float(os.getenv("CRAWL_GLOBAL_RATE", "3"))
+CRAWL_HOST_RATES = {
+    "olx.pl": float(os.getenv("CRAWL_OLX_RATE", "2")),
+    "ceneo.pl": float(os.getenv("CRAWL_CENEO_RATE", "0.5")),
+}
+CRAWL_DEFAULT_HOST_RATE = float(os.getenv("CRAWL_DEFAULT_HOST_RATE", "1"))
+# Upper bound (seconds) for the per-host interval after repeated 429/5xx
+CRAWL_MAX_BACKOFF = float(os.getenv("CRAWL_MAX_BACKOFF", "60"))
+# Retries of a page that answered 429/5xx before it counts as failed
+CRAWL_MAX_RETRIES = int(os.getenv("CRAWL_MAX_RETRIES", "3"))
+
+# Listing details are fetched over plain HTTP first; Playwright is the fallback
+HTTP_FAST_PATH = os.getenv("HTTP_FAST_PATH", "1") == "1"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+# Category walker: OLX stops serving results after page 25
+OLX_MAX_PAGES = int(os.getenv("OLX_MAX_PAGES", "25"))
+# A run of this many already-stored listings means we reached seen territory
+DUPLICATE_STOP = int(os.getenv("DUPLICATE_STOP", "10"))
+
+# Sold rechecks are spaced by SOLD_CHECK_FACTOR * max(age, predicted median survival).
+# A new listing's first check comes from the next_check_at default in db/migrations.
+SOLD_CHECK_FACTOR = float(os.getenv("SOLD_CHECK_FACTOR", "0.25"))
+SOLD_CHECK_MIN_HOURS = float(os.getenv("SOLD_CHECK_MIN_HOURS", "2"))
+SOLD_CHECK_MAX_DAYS = float(os.getenv("SOLD_CHECK_MAX_DAYS", "14"))
+
+# Sold checks probe listings over HTTP first, this many at a time
+SOLD_PROBE_CONCURRENCY = int(os.getenv("SOLD_PROBE_CONCURRENCY", "200"))
+
+# Ceneo offers are cached per normalized query; misses are cached for less time
+CENEO_CACHE_TTL_HOURS = float(os.getenv("CENEO_CACHE_TTL_HOURS", "72"))
+CENEO_CACHE_EMPTY_TTL_HOURS = float(os.getenv("CENEO_CACHE_EMPTY_TTL_HOURS", "24"))
+
+# Failed new-price lookups are retried after BASE * 2^(attempts - 1) hours
+PRICE_LOOKUP_BASE_HOURS = float(os.getenv("PRICE_LOOKUP_BASE_HOURS", "6"))
+PRICE_LOOKUP_MAX_ATTEMPTS = int(os.getenv("PRICE_LOOKUP_MAX_ATTEMPTS", "5"))
+
+# Job queue between crawler stages
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "60"))
+# Jobs that failed for good are kept this long for inspection, then deleted
+JOB_FAILED_RETENTION_DAYS = int(os.getenv("JOB_FAILED_RETENTION_DAYS", "14"))
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "20"))
+WORKER_IDLE_SECONDS = float(os.getenv("WORKER_IDLE_SECONDS", "30"))
+DISCOVER_INTERVAL_SECONDS = float(os.getenv("DISCOVER_INTERVAL_SECONDS", "300"))
+
+# Long-lived browser runtime: consent cookies are persisted between contexts,
+# and the context is rebuilt after CONTEXT_MAX_PAGES loads or when the browser
+# processes use more than BROWSER_MAX_RSS_MB
+BROWSER_STATE_FILE = os.getenv("BROWSER_STATE_FILE", "/tmp/crawler_browser_state.json")
+CONTEXT_MAX_PAGES = int(os.getenv("CONTEXT_MAX_PAGES", "500"))
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+
+# Crawled listings are buffered and upserted in batches of up to this many rows,
+# or once the oldest buffered listing is LISTING_FLUSH_SECONDS old
+LISTING_FLUSH_SIZE = int(os.getenv("LISTING_FLUSH_SIZE", "100"))
+LISTING_FLUSH_SECONDS = float(os.getenv("LISTING_FLUSH_SECONDS", "5"))
+
+# Listings sold more than ARCHIVE_AFTER_DAYS ago are moved to listings_archive
+# in batches of ARCHIVE_BATCH_SIZE, every ARCHIVE_INTERVAL_SECONDS
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Fetched listing pages are kept as zstd-compressed, content-addressed
+# snapshots so listings can be re-parsed without crawling again.
+# SNAPSHOT_DIR="" turns them off; SNAPSHOT_HTML=1 also keeps the full HTML.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_HTML = os.getenv("SNAPSHOT_HTML", "0") == "1"
+SNAPSHOT_ZSTD_LEVEL = int(os.getenv("SNAPSHOT_ZSTD_LEVEL", "6"))
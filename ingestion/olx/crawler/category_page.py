@@ -1,18 +1,42 @@
-async def extract_listing_urls(page, list_url):
-    await page.goto(list_url)
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .rate_limit import throttled_goto
+from .extract import LISTING_CARDS, LISTING_CARD, EMPTY_RESULTS
+
+
+class CategoryPageError(Exception):
+    """The category page did not load as a listing page or an empty one."""
+
 
-    listing_selector = '[data-cy="l-card"]'
-    await page.wait_for_selector(listing_selector, timeout=10000)
+def category_page_url(category_url, page_number):
+    """Returns `category_url` with `page=N` set, keeping the sort order parameters."""
+    if page_number <= 1:
+        return category_url
+    parts = urlsplit(category_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+    query.append(("page", str(page_number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+async def extract_listing_urls(page, list_url):
+    """
+    The listing urls on a category page. Returns [] only for a page that
+    loaded and shows OLX's empty-results view, i.e. past the last page; a
+    failed or slow load raises instead.
+    """
+    resp = await throttled_goto(page, list_url)
+    if resp is not None and not resp.ok:
+        raise CategoryPageError(f"{resp.status} for {list_url}")
 
-    elements = await page.query_selector_all(listing_selector)
+    await page.wait_for_selector(f"{LISTING_CARD}, {EMPTY_RESULTS}", timeout=10000)
 
+    found = await LISTING_CARDS(page)
+    if not found["cards"] and not found["empty"]:
+        raise CategoryPageError(f"No listing cards or empty-results view on {list_url}")
     urls = []
-    for el in elements:
-        link = await el.query_selector("a")
-        if link:
-            href = await link.get_attribute("href")
-            if href:
-                urls.append(
-                    href if href.startswith("http") else f"https://www.olx.pl{href}"
-                )
+    for card in found["cards"]:
+        href = card["href"]
+        if href:
+            urls.append(
+                href if href.startswith("http") else f"https://www.olx.pl{href}"
+            )
     return urls
@@ -0,0 +1,107 @@
+"""
+Declarative DOM extraction. An extractor lists its fields as selectors and
+the whole result comes back as JSON from one page.evaluate() call, instead
+of a query_selector / get_attribute round trip per element.
+
+All selectors the crawler depends on are declared at the bottom of this
+module, so they can be fixed and benchmarked in one place.
+"""
+
+import logging, time
+from .listing_parse import SELLER_LINK_MARKER
+
+_EXTRACT_JS = """
+(spec) => {
+  const read = (el, f) => {
+    if (f.attr === "exists") return el !== null;
+    if (el === null) return null;
+    if (f.attr === "text") return el.innerText;
+    if (f.attr === "textContent") return el.textContent;
+    return el.getAttribute(f.attr);
+  };
+  const collect = (root, fields) => {
+    const out = {};
+    for (const [name, f] of Object.entries(fields)) {
+      if (f.all) {
+        const els = Array.from(root.querySelectorAll(f.selector));
+        out[name] = els.map((el) => (f.fields ? collect(el, f.fields) : read(el, f)));
+      } else {
+        const el = root.querySelector(f.selector);
+        out[name] = f.fields ? (el ? collect(el, f.fields) : null) : read(el, f);
+      }
+    }
+    return out;
+  };
+  return collect(document, spec);
+}
+"""
+
+
+def field(selector, attr="text", all=False, fields=None):
+    """
+    `attr` is an attribute name, "text" (innerText), "textContent" or
+    "exists". With `all`, every match is returned; with `fields`, each match
+    is itself extracted into a dict.
+    """
+    return {"selector": selector, "attr": attr, "all": all, "fields": fields}
+
+
+class Extractor:
+    def __init__(self, name, **fields):
+        self.name = name
+        self.spec = fields
+        self.calls = 0
+        self.seconds = 0.0
+
+    async def __call__(self, page):
+        start = time.perf_counter()
+        try:
+            return await page.evaluate(_EXTRACT_JS, self.spec)
+        finally:
+            self.calls += 1
+            self.seconds += time.perf_counter() - start
+
+    def stats(self):
+        mean_ms = self.seconds / self.calls * 1000 if self.calls else 0.0
+        logging.info(
+            f"crawler -> extract: {self.name} {self.calls} calls, {mean_ms:.1f}ms mean"
+        )
+        return {"calls": self.calls, "mean_ms": mean_ms}
+
+
+LISTING_CARD = '[data-cy="l-card"]'
+# OLX's "no listings found" view, shown past the last page of a category
+EMPTY_RESULTS = '[data-testid="empty-listing-view"], [data-cy="no-results"]'
+
+LISTING_CARDS = Extractor(
+    "listing_cards",
+    cards=field(LISTING_CARD, all=True, fields={"href": field("a", "href")}),
+    empty=field(EMPTY_RESULTS, "exists"),
+)
+
+LISTING_DETAILS = Extractor(
+    "listing_details",
+    ld=field('script[type="application/ld+json"]', "textContent"),
+    seller_url=field(f'a[href*="{SELLER_LINK_MARKER}"]', "href"),
+)
+
+CENEO_RESULTS = Extractor(
+    "ceneo_results",
+    not_found=field(".not-found", "exists"),
+    rows=field(
+        ".js_category-list-item, .cat-prod-row",
+        all=True,
+        fields={"price": field(".price-format")},
+    ),
+    top_price=field(".product-top__price .price-format"),
+    offers_price=field(".product-offers__price .price-format"),
+)
+
+LISTING_STATUS = Extractor(
+    "listing_status",
+    error_page=field('[data-testid="error-page"]', "exists"),
+    ld=field('script[type="application/ld+json"]', "textContent"),
+    body=field("body", "textContent"),
+)
+
+EXTRACTORS = [LISTING_CARDS, LISTING_DETAILS, CENEO_RESULTS, LISTING_STATUS]
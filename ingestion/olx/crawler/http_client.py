@@ -0,0 +1,19 @@
+import httpx
+from config import USER_AGENT, HTTP_POOL_SIZE, HTTP_TIMEOUT
+
+
+def new_http_client():
+    """One pooled client per process; use it as `async with new_http_client() as client`."""
+    return httpx.AsyncClient(
+        headers={
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "pl-PL,pl;q=0.9",
+        },
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+        ),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    )
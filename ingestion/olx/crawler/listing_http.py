@@ -0,0 +1,90 @@
+import logging
+from html.parser import HTMLParser
+from config import SNAPSHOT_HTML
+from storage.snapshots import snapshots
+from .rate_limit import limiter
+from .listing_parse import SELLER_LINK_MARKER, listing_from_fragments
+
+
+class ListingHTMLParser(HTMLParser):
+    """
+    Streaming parser that keeps only the first JSON-LD script and the first
+    seller link. `done` turns True as soon as both have been seen.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ld_text = None
+        self.seller_url = None
+        self._in_ld = False
+        self._ld_parts = []
+
+    @property
+    def done(self):
+        return self.ld_text is not None and self.seller_url is not None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script" and self.ld_text is None:
+            if dict(attrs).get("type") == "application/ld+json":
+                self._in_ld = True
+                self._ld_parts = []
+        elif tag == "a" and self.seller_url is None:
+            href = dict(attrs).get("href")
+            if href and SELLER_LINK_MARKER in href:
+                self.seller_url = href
+
+    def handle_data(self, data):
+        if self._in_ld:
+            self._ld_parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._in_ld:
+            self._in_ld = False
+            self.ld_text = "".join(self._ld_parts)
+
+
+def parse_listing_html(url, chunks):
+    """Builds the listing dict from an iterable of HTML text chunks."""
+    parser = ListingHTMLParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return listing_from_parser(url, parser)
+
+
+def listing_from_parser(url, parser):
+    return listing_from_fragments(url, parser.ld_text, parser.seller_url)
+
+
+async def fetch_listing_details(client, url):
+    """
+    Fetches the listing with the shared HTTP client and parses it while it
+    streams in, then snapshots what was found. Returns None when OLX does not
+    answer with the listing page.
+    """
+    await limiter.acquire(url)
+    async with client.stream("GET", url) as resp:
+        limiter.record(url, resp.status_code, resp.headers.get("retry-after"))
+        if resp.status_code != 200:
+            logging.info(f"crawler -> listing_http: {resp.status_code} for {url}")
+            return None
+
+        parser = ListingHTMLParser()
+        html = []
+        async for chunk in resp.aiter_text():
+            if SNAPSHOT_HTML:
+                # Keep reading to the end so the snapshot has the whole page
+                html.append(chunk)
+                if not parser.done:
+                    parser.feed(chunk)
+                continue
+            parser.feed(chunk)
+            if parser.done:
+                break
+
+    fragments = {"ld": parser.ld_text, "seller_url": parser.seller_url}
+    if SNAPSHOT_HTML:
+        fragments["html"] = "".join(html)
+    await snapshots.save_async(url, fragments)
+    return listing_from_parser(url, parser)
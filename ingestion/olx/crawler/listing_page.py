@@ -1,54 +1,48 @@
-import datetime, json, logging
+import logging
+from config import SNAPSHOT_HTML
+from storage.snapshots import snapshots
+from .rate_limit import throttled_goto
+from .extract import LISTING_DETAILS
+from .listing_parse import listing_from_fragments, is_complete
+from .listing_http import fetch_listing_details
 
 logging.basicConfig(level=logging.INFO)
 
 
-async def extract_listing_details(page, url):
-    await page.goto(url)
-    await page.wait_for_load_state("domcontentloaded")
+async def read_listing_fragments(page):
+    """The JSON-LD text and seller link of the document loaded in `page`."""
+    found = await LISTING_DETAILS(page)
+    return {"ld": found["ld"], "seller_url": found["seller_url"]}
 
-    data = {
-        "url": url,
-        "crawled_at": str(datetime.datetime.now()),
-    }
-
-    try:
-        ld_script = await page.query_selector('script[type="application/ld+json"]')
-
-        if ld_script:
-            ld = json.loads(await ld_script.inner_text())
-            data["name"] = ld.get("name", None)
-            data["description"] = ld.get("description", None)
-            data["category"] = ld.get("category", None)
-            data["image"] = ld.get("image", [None])[0]
-            data["sku"] = ld.get("sku", None)
-            data["city"] = (
-                ld.get("offers", None).get("areaServed", None).get("name", None)
-            )
-            data["price"] = (
-                int(ld.get("offers", None).get("price", None))
-                if "offers" in ld
-                else None
+
+async def read_listing_details(page, url):
+    """Extracts listing fields from the document already loaded in `page`."""
+    fragments = await read_listing_fragments(page)
+    return listing_from_fragments(url, fragments["ld"], fragments["seller_url"])
+
+
+async def extract_listing_details(page, url, client=None):
+    """
+    Tries the plain HTTP fetch first when a `client` is given and only renders
+    the listing in Playwright when that fails or comes back incomplete.
+    """
+    if client is not None:
+        try:
+            data = await fetch_listing_details(client, url)
+            if data is not None and is_complete(data):
+                return data
+        except Exception as e:
+            logging.warning(
+                f"crawler -> listing_page: HTTP fetch failed for {url}: {e}"
             )
-            match ld.get("offers", None).get("itemCondition", None):
-                case "https://schema.org/NewCondition":
-                    data["condition"] = "new"
-                case "https://schema.org/UsedCondition":
-                    data["condition"] = "used"
-                case "https://schema.org/RefurbishedCondition":
-                    data["condition"] = "refurbished"
-                case "https://schema.org/DamagedCondition":
-                    data["condition"] = "damaged"
-                case _:
-                    data["condition"] = "unknown"
-    except Exception as e:
-        logging.error(f"crawler -> listing_page: Error parsing JSON-LD for {url}: {e}")
-
-    try:
-        user_link = await page.query_selector('a[href*="/oferty/uzytkownik/"]')
-        if user_link:
-            seller_url = await user_link.get_attribute("href")
-            data["seller_id"] = seller_url.split("/")[3] if seller_url else None
-    except Exception as e:
-        logging.error(f"crawler -> listing_page: Error parsing seller for {url}: {e}")
-    return data
+        logging.info(f"crawler -> listing_page: Falling back to browser for {url}")
+
+    resp = await throttled_goto(page, url)
+    await page.wait_for_load_state("domcontentloaded")
+    fragments = await read_listing_fragments(page)
+    # Error pages are not worth keeping for re-parsing
+    if resp is None or resp.ok:
+        if SNAPSHOT_HTML:
+            fragments["html"] = await page.content()
+        await snapshots.save_async(url, fragments)
+    return listing_from_fragments(url, fragments["ld"], fragments["seller_url"])
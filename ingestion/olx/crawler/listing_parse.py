@@ -0,0 +1,73 @@
+import datetime, json, logging
+
+SELLER_LINK_MARKER = "/oferty/uzytkownik/"
+
+# Fields a listing must have for the HTTP fast path to be trusted
+REQUIRED_FIELDS = ("name", "price", "seller_id")
+
+
+def new_listing(url):
+    return {
+        "url": url,
+        "crawled_at": str(datetime.datetime.now()),
+    }
+
+
+def apply_ld(data, ld):
+    """Copies the fields we keep from a listing's JSON-LD into `data`."""
+    data["name"] = ld.get("name", None)
+    data["description"] = ld.get("description", None)
+    data["category"] = ld.get("category", None)
+    data["image"] = ld.get("image", [None])[0]
+    data["sku"] = ld.get("sku", None)
+    data["city"] = ld.get("offers", None).get("areaServed", None).get("name", None)
+    data["price"] = (
+        int(ld.get("offers", None).get("price", None)) if "offers" in ld else None
+    )
+    match ld.get("offers", None).get("itemCondition", None):
+        case "https://schema.org/NewCondition":
+            data["condition"] = "new"
+        case "https://schema.org/UsedCondition":
+            data["condition"] = "used"
+        case "https://schema.org/RefurbishedCondition":
+            data["condition"] = "refurbished"
+        case "https://schema.org/DamagedCondition":
+            data["condition"] = "damaged"
+        case _:
+            data["condition"] = "unknown"
+
+
+def apply_seller(data, seller_url):
+    data["seller_id"] = seller_url.split("/")[3] if seller_url else None
+
+
+def is_complete(data):
+    missing = [f for f in REQUIRED_FIELDS if data.get(f) is None]
+    if missing:
+        logging.info(
+            f"crawler -> listing_parse: {data.get('url')} missing {', '.join(missing)}"
+        )
+    return not missing
+
+
+def listing_from_fragments(url, ld_text, seller_url, crawled_at=None):
+    """
+    Builds the listing dict from the raw JSON-LD text and seller link, as
+    found by either fetch path or read back from a snapshot.
+    """
+    data = new_listing(url)
+    if crawled_at is not None:
+        data["crawled_at"] = str(crawled_at)
+    if ld_text:
+        try:
+            apply_ld(data, json.loads(ld_text))
+        except Exception as e:
+            logging.error(
+                f"crawler -> listing_parse: Error parsing JSON-LD for {url}: {e}"
+            )
+    try:
+        if seller_url:
+            apply_seller(data, seller_url)
+    except Exception as e:
+        logging.error(f"crawler -> listing_parse: Error parsing seller for {url}: {e}")
+    return data
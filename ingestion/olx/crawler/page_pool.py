@@ -0,0 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class PagePool:
+    """A fixed set of pages in one browser context, handed out one task at a time."""
+
+    def __init__(self, context, size):
+        self.context = context
+        self.size = max(1, size)
+        self.pages = []
+        self.queue = asyncio.Queue()
+
+    async def open(self):
+        for _ in range(self.size):
+            page = await self.context.new_page()
+            self.pages.append(page)
+            self.queue.put_nowait(page)
+        return self
+
+    async def close(self):
+        for page in self.pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self.pages = []
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.queue.get()
+        try:
+            yield page
+        finally:
+            self.queue.put_nowait(page)
+
+    async def map(self, items, fn):
+        """Runs `fn(page, item)` for every item on the pool; exceptions are returned, not raised."""
+
+        async def run(item):
+            async with self.page() as page:
+                return await fn(page, item)
+
+        return await asyncio.gather(
+            *(run(item) for item in items), return_exceptions=True
+        )
@@ -0,0 +1,127 @@
+import asyncio, datetime, logging, random, time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from config import (
+    CRAWL_GLOBAL_RATE,
+    CRAWL_HOST_RATES,
+    CRAWL_DEFAULT_HOST_RATE,
+    CRAWL_MAX_BACKOFF,
+    CRAWL_MAX_RETRIES,
+)
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Throttled(Exception):
+    """The host kept answering 429/5xx after every retry."""
+
+
+class _Bucket:
+    """
+    Spaces requests at least `interval` seconds apart.
+    The interval doubles on throttling responses and decays back on success.
+    """
+
+    def __init__(self, rate, jitter=0.5):
+        self.base_interval = 1.0 / rate if rate > 0 else 0.0
+        self.interval = self.base_interval
+        self.jitter = jitter
+        self.next_at = 0.0
+
+    async def wait(self):
+        # Reserve the slot first so concurrent callers queue up behind each other
+        now = time.monotonic()
+        start = max(now, self.next_at)
+        self.next_at = start + self.interval * random.uniform(1, 1 + self.jitter)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def throttled(self, retry_after=None):
+        self.interval = min(
+            max(self.interval * 2, self.base_interval, 1.0), CRAWL_MAX_BACKOFF
+        )
+        pause = retry_after if retry_after is not None else self.interval
+        self.next_at = max(self.next_at, time.monotonic() + pause)
+
+    def succeeded(self):
+        self.interval = max(self.base_interval, self.interval * 0.9)
+
+
+class RateLimiter:
+    def __init__(self, global_rate, host_rates, default_host_rate):
+        self.global_bucket = _Bucket(global_rate, jitter=0)
+        self.host_rates = host_rates
+        self.default_host_rate = default_host_rate
+        self.host_buckets = {}
+
+    def _host_key(self, url):
+        host = urlsplit(url).hostname or ""
+        for domain in self.host_rates:
+            if host == domain or host.endswith("." + domain):
+                return domain
+        return host
+
+    def _bucket(self, url):
+        key = self._host_key(url)
+        if key not in self.host_buckets:
+            rate = self.host_rates.get(key, self.default_host_rate)
+            self.host_buckets[key] = _Bucket(rate)
+        return self.host_buckets[key]
+
+    async def acquire(self, url):
+        await self._bucket(url).wait()
+        await self.global_bucket.wait()
+
+    def record(self, url, status, retry_after=None):
+        """Feeds a response status back; `retry_after` is the raw header value."""
+        if status is None:
+            return
+        bucket = self._bucket(url)
+        if status in THROTTLE_STATUSES:
+            bucket.throttled(_seconds(retry_after))
+            logging.warning(
+                f"crawler -> rate_limit: {status} from {self._host_key(url)}, "
+                f"interval now {bucket.interval:.1f}s"
+            )
+        else:
+            bucket.succeeded()
+
+
+limiter = RateLimiter(CRAWL_GLOBAL_RATE, CRAWL_HOST_RATES, CRAWL_DEFAULT_HOST_RATE)
+
+
+def _seconds(value):
+    """Retry-After as seconds: either delta-seconds or an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    )
+
+
+async def throttled_goto(page, url, **kwargs):
+    """
+    page.goto() paced by the shared limiter, feeding the response status back.
+    A 429/5xx answer is retried after the backoff, up to CRAWL_MAX_RETRIES
+    times, then raises Throttled so the url is reported as failed instead of
+    parsing the error page.
+    """
+    for attempt in range(CRAWL_MAX_RETRIES + 1):
+        await limiter.acquire(url)
+        resp = await page.goto(url, **kwargs)
+        if resp is None:
+            return resp
+        limiter.record(url, resp.status, resp.headers.get("retry-after"))
+        if resp.status not in THROTTLE_STATUSES:
+            return resp
+    raise Throttled(f"{resp.status} for {url} after {attempt + 1} attempts")
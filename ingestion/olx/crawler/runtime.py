@@ -0,0 +1,138 @@
+import logging, os
+from playwright.async_api import async_playwright
+from config import (
+    OLX_URLS,
+    USER_AGENT,
+    CRAWL_WORKERS,
+    BROWSER_STATE_FILE,
+    CONTEXT_MAX_PAGES,
+    BROWSER_MAX_RSS_MB,
+)
+from .page_pool import PagePool
+from .http_client import new_http_client
+
+
+def browser_rss_mb():
+    """Resident memory of all Chromium processes in this container, in MB."""
+    total_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"chrom" not in f.read():
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+class CrawlerRuntime:
+    """
+    One browser, one warmed context with its page pool, and one HTTP client,
+    kept for the life of the process. The context starts from the persisted
+    storage state (consent cookies). At safe points, `maybe_recycle()` rebuilds
+    the context once it has loaded CONTEXT_MAX_PAGES pages, and relaunches the
+    browser when it grows past BROWSER_MAX_RSS_MB or has died.
+
+        async with CrawlerRuntime() as runtime:
+            await runtime.page.goto(...)
+            await runtime.pool.map(urls, fn)
+    """
+
+    def __init__(self, pool_size=CRAWL_WORKERS):
+        self.pool_size = pool_size
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.pool = None
+        self.client = None
+        self.pages_loaded = 0
+
+    async def __aenter__(self):
+        self.playwright = await async_playwright().start()
+        self.client = new_http_client()
+        await self._launch()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._close_context()
+        if self.browser is not None:
+            await self.browser.close()
+        await self.client.aclose()
+        await self.playwright.stop()
+
+    async def _launch(self):
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        await self._open_context()
+
+    async def _open_context(self):
+        has_state = os.path.exists(BROWSER_STATE_FILE)
+        self.context = await self.browser.new_context(
+            user_agent=USER_AGENT,
+            storage_state=BROWSER_STATE_FILE if has_state else None,
+        )
+        self.pages_loaded = 0
+        self.context.on("page", self._watch_page)
+        self.page = await self.context.new_page()
+        if not has_state:
+            await self._accept_consent()
+        self.pool = await PagePool(self.context, self.pool_size).open()
+
+    async def _accept_consent(self):
+        try:
+            await self.page.goto(OLX_URLS[0])
+            await self.page.click("button#onetrust-accept-btn-handler", timeout=5000)
+            await self.context.storage_state(path=BROWSER_STATE_FILE)
+        except Exception as e:
+            logging.info(f"crawler -> runtime: No consent banner accepted: {e}")
+
+    def _watch_page(self, page):
+        page.on("load", self._count_load)
+
+    def _count_load(self, *_):
+        self.pages_loaded += 1
+
+    async def _close_context(self):
+        if self.context is None:
+            return
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+        self.context = self.page = self.pool = None
+
+    async def maybe_recycle(self):
+        """
+        Rebuilds the context or relaunches the browser when due; call between
+        batches. Raises when the rebuild fails; the next call tries again.
+        """
+        if not self.browser.is_connected():
+            logging.warning("crawler -> runtime: Browser disconnected, relaunching")
+            self.context = None
+            await self._launch()
+            return
+        if self.context is None:
+            # An earlier rebuild failed halfway
+            logging.warning("crawler -> runtime: No open context, reopening")
+            await self._open_context()
+            return
+
+        rss = browser_rss_mb()
+        if rss >= BROWSER_MAX_RSS_MB:
+            logging.info(f"crawler -> runtime: Browser at {rss:.0f}MB, relaunching")
+            await self._close_context()
+            await self.browser.close()
+            await self._launch()
+        elif self.pages_loaded >= CONTEXT_MAX_PAGES:
+            logging.info(
+                f"crawler -> runtime: Recycling context after {self.pages_loaded} pages"
+            )
+            await self._close_context()
+            await self._open_context()
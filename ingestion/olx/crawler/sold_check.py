@@ -1,5 +1,14 @@
 import json
 from playwright.async_api import TimeoutError as PlaywrightTimeout
+from .rate_limit import throttled_goto
+from .extract import LISTING_STATUS
+
+SOLD_MARKERS = [
+    "ogłoszenie nie jest już dostępne",
+    "ogłoszenie zostało zakończone",
+    "ogłoszenie usunięte",
+    "nie znaleziono",
+]
 
 
 async def is_listing_active(page, url: str) -> bool:
@@ -8,7 +17,9 @@ async def is_listing_active(page, url: str) -> bool:
     """
 
     try:
-        resp = await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+        resp = await throttled_goto(
+            page, url, wait_until="domcontentloaded", timeout=15000
+        )
     except PlaywrightTimeout:
         return False
 
@@ -21,36 +32,22 @@ async def is_listing_active(page, url: str) -> bool:
     except PlaywrightTimeout:
         pass
 
-    # Check for "sold" or "removed" indicators
-    # Option 1: Look for specific error elements
-    try:
-        error_element = await page.query_selector('[data-testid="error-page"]')
-        if error_element:
-            return False
-    except:
-        pass
+    # Error element, JSON-LD and body text in one round trip
+    status = await LISTING_STATUS(page)
+    if status["error_page"]:
+        return False
 
-    # Option 2: Check JSON-LD for price/offers (active listings have price data)
+    # Active listings carry price data in their JSON-LD offers
     try:
-        ld_script = await page.query_selector('script[type="application/ld+json"]')
-        if ld_script:
-            ld_content = await ld_script.inner_text()
-            ld_data = json.loads(ld_content)
-            # If listing has offers with price, it's active
+        if status["ld"]:
+            ld_data = json.loads(status["ld"])
             if "offers" in ld_data and "price" in ld_data.get("offers", {}):
                 return True
         # If no JSON-LD or no price data, continue to text-based checks
     except Exception:
         pass
 
-    # Option 3: Text-based check as fallback
-    content = await page.text_content("body") or ""
-
-    SOLD_MARKERS = [
-        "ogłoszenie nie jest już dostępne",
-        "ogłoszenie zostało zakończone",
-        "ogłoszenie usunięte",
-        "nie znaleziono",
-    ]
+    # Text-based check as fallback
+    content = status["body"] or ""
 
     return not any(marker in content.lower() for marker in SOLD_MARKERS)
@@ -0,0 +1,47 @@
+import html, json, re
+from urllib.parse import urlsplit
+from .rate_limit import limiter
+from .sold_check import SOLD_MARKERS
+
+LD_JSON_RE = re.compile(
+    r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.S | re.I
+)
+LISTING_PATH_MARKER = "/oferta/"
+
+
+def classify_listing_html(text):
+    """True if the page carries a priced offer, False if it says sold, None if unsure."""
+    match = LD_JSON_RE.search(text)
+    if match:
+        try:
+            ld = json.loads(match.group(1))
+            if "offers" in ld and "price" in ld.get("offers", {}):
+                return True
+        except Exception:
+            pass
+
+    if 'data-testid="error-page"' in text:
+        return False
+    content = html.unescape(text).lower()
+    if any(marker in content for marker in SOLD_MARKERS):
+        return False
+    return None
+
+
+async def probe_listing(client, url):
+    """
+    Cheap sold check over plain HTTP. Returns True (active), False (sold or
+    removed) or None when only a rendered page can tell.
+    """
+    await limiter.acquire(url)
+    resp = await client.get(url)
+    limiter.record(url, resp.status_code, resp.headers.get("retry-after"))
+
+    if resp.status_code in (404, 410):
+        return False
+    if resp.status_code >= 400:
+        return None
+    # Removed listings redirect to a category or search page
+    if resp.history and LISTING_PATH_MARKER not in urlsplit(str(resp.url)).path:
+        return False
+    return classify_listing_html(resp.text)
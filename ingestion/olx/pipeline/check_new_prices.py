@@ -1,13 +1,16 @@
 import asyncio
 import logging
-import random
 import re
 from playwright.async_api import async_playwright
-from storage.session import init_db
-from storage.repository import (
+from crawler.rate_limit import throttled_goto
+from crawler.extract import CENEO_RESULTS
+from storage.session import init_async_db
+from storage.async_repository import (
     get_listings_without_new_price,
     update_listing_new_price,
     update_listing_new_price_not_found,
+    get_cached_offers,
+    store_offers,
 )
 
 logging.basicConfig(
@@ -16,13 +19,47 @@ logging.basicConfig(
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
+# Words that say nothing about the product and only split the cache
+NOISE_TOKENS = set(
+    """
+    sprzedam sprzedaż okazja okazyjnie tanio pilne pilnie super polecam
+    nowy nowa nowe używany używana używane uzywany stan idealny idealna idealne
+    bardzo dobry dobra igła gwarancja gwarancją oryginalny oryginalna komplet
+    zamienię zamiana faktura wysyłka
+    i w z na do dla oraz bez lub od po
+    """.split()
+)
 
-async def get_ceneo_price(page, query, listing_price):
+
+def normalize_tokens(title):
+    """Lowercased word tokens of a listing title without sales noise."""
+    tokens = re.findall(r"\w+", title.lower())
+    return [
+        t for t in tokens if t not in NOISE_TOKENS and not (len(t) == 1 and t.isalpha())
+    ]
+
+
+def search_query(title):
+    return " ".join(normalize_tokens(title)) or title
+
+
+def cache_key(title, sku=None):
+    """Listings of the same product share a key: the sku, else their sorted title tokens."""
+    if sku:
+        return f"sku:{str(sku).strip().lower()}"
+    return "q:" + " ".join(sorted(set(normalize_tokens(title))))
+
+
+async def fetch_ceneo_offers(page, query):
+    """
+    Returns the offer prices Ceneo lists for `query`, [] when nothing was
+    found, or None when the lookup itself failed.
+    """
     try:
         logging.info(f"Searching Ceneo for: {query}")
         # Build search URL
         search_url = f"https://www.ceneo.pl/;szukaj-{query};0112-1.htm"
-        await page.goto(search_url)
+        await throttled_goto(page, search_url)
 
         # Strategies:
         # 1. Look for product list items on search page.
@@ -40,73 +77,79 @@ async def get_ceneo_price(page, query, listing_price):
             )
         except:
             logging.info("No results selector found (timeout).")
-            return None
+            return []
+
+        # Read the whole result page in one round trip
+        found = await CENEO_RESULTS(page)
 
         # Check for explicit "not found" element
-        if await page.query_selector(".not-found"):
+        if found["not_found"]:
             logging.info(f"No results found for '{query}' on Ceneo.")
-            return None
+            return []
 
-        # Check list items - robust selector for different Ceneo layouts
-        product_rows = await page.query_selector_all(
-            ".js_category-list-item, .cat-prod-row"
-        )
+        if found["rows"]:
+            logging.info(f"Found {len(found['rows'])} products on search page.")
+            price_texts = [row["price"] for row in found["rows"]]
+        else:
+            # Check if we are on a product page: top price, or offers price
+            price_texts = [found["top_price"] or found["offers_price"]]
 
         prices = []
+        for text_price in price_texts:
+            if not text_price:
+                continue
+            clean_price = (
+                text_price.replace(",", ".").replace(" ", "").replace("zł", "")
+            )
+            try:
+                prices.append(float(clean_price))
+            except ValueError:
+                pass
 
-        if product_rows:
-            logging.info(f"Found {len(product_rows)} products on search page.")
-            # Iterate over first few results and get prices
-            for row in product_rows:
-                price_elem = await row.query_selector(".price-format")
-                if price_elem:
-                    text_price = await price_elem.inner_text()
-                    # cleanup text
-                    clean_price = (
-                        text_price.replace(",", ".").replace(" ", "").replace("zł", "")
-                    )
-                    try:
-                        prices.append(float(clean_price))
-                    except ValueError:
-                        pass
-        else:
-            # Check if we are on a product page
-            price_elem = await page.query_selector(
-                ".product-top__price .price-format"
-            )  # check top price
-            if not price_elem:
-                price_elem = await page.query_selector(
-                    ".product-offers__price .price-format"
-                )  # or offers price
-
-            if price_elem:
-                text_price = await price_elem.inner_text()
-                clean_price = (
-                    text_price.replace(",", ".").replace(" ", "").replace("zł", "")
-                )
-                try:
-                    prices.append(float(clean_price))
-                except ValueError:
-                    pass
-
-        if prices:
-            min_price = min([p for p in prices if p > listing_price])
-            logging.info(f"Min price found: {min_price}")
-            return min_price
-
-        return None
+        return prices
 
     except Exception as e:
         logging.error(f"Error scraping Ceneo for {query}: {e}")
         return None
 
 
+def pick_new_price(offers, listing_price):
+    """The cheapest offer above the listing price, or None."""
+    above = [p for p in offers if p > (listing_price or 0)]
+    if above:
+        min_price = min(above)
+        logging.info(f"Min price found: {min_price}")
+        return min_price
+    return None
+
+
+async def get_ceneo_price(page, query, listing_price):
+    offers = await fetch_ceneo_offers(page, query)
+    return pick_new_price(offers, listing_price) if offers else None
+
+
+async def lookup_offers(session, page, title, sku=None):
+    """Ceneo offers for a listing, served from the cache when a fresh entry exists."""
+    key = cache_key(title, sku)
+    offers = await get_cached_offers(session, key)
+    if offers is not None:
+        logging.info(f"Ceneo cache hit for {key}")
+        return offers
+
+    offers = await fetch_ceneo_offers(page, search_query(title))
+    if offers is not None:
+        await store_offers(session, key, offers, commit=False)
+    return offers
+
+
 async def check_new_prices_batch(session, page, limit=20):
     """
-    Checks for new prices for a batch of listings.
+    Checks for new prices for a batch of listings. The results of the batch
+    are committed together; if it fails halfway, its listings are claimed
+    again once their lease runs out.
     Returns True if any items were processed, False otherwise.
     """
-    listings = get_listings_without_new_price(session, limit=limit)
+    listings = await get_listings_without_new_price(session, limit=limit)
 
     if not listings:
         logging.info("No listings to check for new prices.")
@@ -122,28 +165,39 @@ async def check_new_prices_batch(session, page, limit=20):
 
         if not title:
             logging.warning(f"No name for listing {listing_id}, skipping.")
-            update_listing_new_price_not_found(session, listing_id)
+            await update_listing_new_price_not_found(
+                session, listing_id, error="no name", give_up=True, commit=False
+            )
             continue
 
         listing_price = raw_data.get("price", 0)
 
-        price = await get_ceneo_price(page, title, listing_price)
+        offers = await lookup_offers(session, page, title, raw_data.get("sku"))
+        price = pick_new_price(offers, listing_price) if offers else None
 
         if price:
-            update_listing_new_price(session, listing_id, price)
+            await update_listing_new_price(session, listing_id, price, commit=False)
             logging.info(f"Updated listing {listing_id} with price {price}")
         else:
-            update_listing_new_price_not_found(session, listing_id)
-            logging.info(f"Price not found for listing {listing_id}, marked as -1")
-
-        sleep_time = random.uniform(2, 5)
-        await asyncio.sleep(sleep_time)
+            if offers is None:
+                error = "lookup failed"
+            elif offers:
+                error = "no offer above listing price"
+            else:
+                error = "not found"
+            await update_listing_new_price_not_found(
+                session, listing_id, error=error, commit=False
+            )
+            logging.info(
+                f"Price not found for listing {listing_id} ({error}), marked as -1"
+            )
 
+    await session.commit()
     return True
 
 
 async def check_new_prices_loop():
-    session = init_db()
+    session = await init_async_db()
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         context = await browser.new_context(user_agent=USER_AGENT)
@@ -158,7 +212,7 @@ async def check_new_prices_loop():
         except Exception as e:
             logging.error(f"Critical error in check_new_prices loop: {e}")
         finally:
-            session.close()
+            await session.close()
             await browser.close()
 
 
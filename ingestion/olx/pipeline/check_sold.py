@@ -1,30 +1,73 @@
-import asyncio, random
+import asyncio
+from config import SOLD_PROBE_CONCURRENCY
 from crawler.sold_check import is_listing_active
-from storage.repository import get_unsold_urls, mark_as_sold
+from crawler.sold_probe import probe_listing
+from storage.async_repository import (
+    get_due_listings,
+    mark_as_sold,
+    schedule_rechecks,
+)
+from pipeline.recheck_schedule import next_check_at, retry_at
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 
-async def check_sold_listings(session, page, batch_size=200):
-    rows = get_unsold_urls(session, limit=batch_size)
+async def probe_all(client, urls):
+    """Probes every url concurrently; errors count as inconclusive."""
+    semaphore = asyncio.Semaphore(SOLD_PROBE_CONCURRENCY)
+
+    async def probe(url):
+        async with semaphore:
+            try:
+                return await probe_listing(client, url)
+            except Exception as e:
+                logging.info(f"Probe failed for {url}: {e}")
+                return None
+
+    return await asyncio.gather(*(probe(url) for url in urls))
+
+
+async def check_sold_listings(session, page, batch_size=200, client=None):
+    """
+    Checks one batch of listings whose next sold check is due.
+    With a `client`, listings are probed over HTTP first and only the
+    inconclusive ones are opened in the browser. Sold marks and the next
+    check times of the batch are committed together.
+    Returns False once nothing is due, so callers can loop until then.
+    """
+    rows = await get_due_listings(session, limit=batch_size)
 
     if not rows:
-        logging.info("No unsold listings to check.")
+        logging.info("No unsold listings due for a check.")
         return False
 
     logging.info(f"Checking sold status for {len(rows)} listings")
 
-    for listing_id, url in rows:
+    if client is not None:
+        probes = await probe_all(client, [row[1] for row in rows])
+        escalated = sum(1 for result in probes if result is None)
+        logging.info(f"Probed {len(rows)} listings, {escalated} need the browser")
+    else:
+        probes = [None] * len(rows)
+
+    schedule = []
+    for (listing_id, url, created_at, median_survival_days), active in zip(
+        rows, probes
+    ):
         try:
-            active = await is_listing_active(page, url)
+            if active is None:
+                active = await is_listing_active(page, url)
             if not active:
                 logging.info(f"Marking as sold: {url}")
-                mark_as_sold(session, listing_id)
-
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+                await mark_as_sold(session, listing_id, commit=False)
+            schedule.append(
+                (listing_id, next_check_at(created_at, median_survival_days))
+            )
 
         except Exception as e:
             logging.error(f"Error checking sold status for {url}: {e}")
+            schedule.append((listing_id, retry_at()))
 
+    await schedule_rechecks(session, schedule)
     return True
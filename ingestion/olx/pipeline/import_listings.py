@@ -0,0 +1,366 @@
+"""
+Bulk-loads listing dumps, e.g. to seed a new or benchmark database:
+
+    python -m pipeline.import_listings dumps/*.ndjson.gz [--workers 8] [--no-prices]
+
+Dumps are NDJSON (one extract_listing_details dict per line) or CSV with
+those keys as header, optionally gzipped. Reader processes COPY them into
+the unlogged listings_import staging table: uncompressed NDJSON is split in
+byte ranges, other files are read whole. The staging rows are then deduped
+on url (newest crawled_at wins) and merged into listings in url order, in
+batches of one INSERT ... ON CONFLICT (url) DO UPDATE each.
+
+An existing listing is only updated by a row crawled at least as recently,
+and urls already in listings_archive are skipped. With prices recorded, the
+price of each merged row is appended to the price history as observed at its
+crawled_at. Run one import at a time.
+"""
+
+import argparse, csv, datetime, gzip, io, json, logging, multiprocessing, os, time
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from config import DATABASE_URL
+from storage import price_history
+from storage.listing_columns import typed_columns
+from storage.models import Listing
+from storage.schema import declared_type
+from storage.session import init_db
+
+logging.basicConfig(level=logging.INFO)
+
+# Crawled fields loaded into their typed columns; the rest stays in raw_data
+COLUMNS = (
+    "url",
+    "crawled_at",
+    "name",
+    "description",
+    "category",
+    "image",
+    "sku",
+    "city",
+    "price",
+    "condition",
+    "seller_id",
+)
+STAGING = "listings_import"
+MERGE = "listings_import_merge"
+CHUNK_MB = 64
+COPY_ROWS = 20000
+MERGE_BATCH = 50000
+# Orders rows across files: file index in the high bits, line position below
+FILE_ORDER = 2**40
+
+
+def dump_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def plan_chunks(paths, chunk_bytes):
+    """(path, file_index, start, end) read tasks; end is None for whole files."""
+    tasks = []
+    for index, path in enumerate(paths):
+        size = os.path.getsize(path)
+        if path.endswith(".gz") or dump_format(path) == "csv" or size <= chunk_bytes:
+            tasks.append((path, index, 0, None))
+            continue
+        for start in range(0, size, chunk_bytes):
+            tasks.append((path, index, start, min(start + chunk_bytes, size)))
+    return tasks
+
+
+def ndjson_range(path, start, end):
+    """Yields (position, line) of the lines that start in [start, end)."""
+    with open(path, "rb") as f:
+        if start:
+            # Skip the line in progress; it belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        while True:
+            position = f.tell()
+            if end is not None and position >= end:
+                return
+            line = f.readline()
+            if not line:
+                return
+            yield position, line
+
+
+def read_records(path, start, end):
+    """Yields (position, listing dict or None when unreadable)."""
+    if dump_format(path) == "csv":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", newline="") as f:
+            for n, record in enumerate(csv.DictReader(f)):
+                yield n, {k: v for k, v in record.items() if k and v != ""}
+        return
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            lines = enumerate(f)
+            yield from ((n, parse_line(line)) for n, line in lines if line.strip())
+        return
+    for position, line in ndjson_range(path, start, end):
+        if line.strip():
+            yield position, parse_line(line)
+
+
+def parse_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def copy_value(value):
+    """`value` in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    # Postgres text and jsonb cannot hold NUL characters
+    return (
+        str(value)
+        .replace("\x00", "")
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def staging_line(data, order, now):
+    row = typed_columns(data)
+    values = [order, now, json.dumps(data).replace("\\u0000", "")]
+    values += [row.get(name) for name in COLUMNS]
+    return "\t".join(copy_value(v) for v in values) + "\n"
+
+
+_engine = None
+
+
+def init_reader():
+    global _engine
+    logging.getLogger().setLevel(logging.ERROR)
+    _engine = create_engine(DATABASE_URL, poolclass=NullPool)
+
+
+def load_chunk(task):
+    """COPYs one read task into the staging table; returns (task, rows, bad)."""
+    path, index, start, end = task
+    copy_sql = (
+        f"COPY {STAGING} (ord, created_at, raw_data, {', '.join(COLUMNS)}) FROM STDIN"
+    )
+    now = datetime.datetime.utcnow()
+    rows = bad = 0
+    conn = _engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        buffer, buffered = io.StringIO(), 0
+        for position, data in read_records(path, start, end):
+            if not data or not data.get("url"):
+                bad += 1
+                continue
+            buffer.write(staging_line(data, index * FILE_ORDER + position, now))
+            buffered += 1
+            if buffered >= COPY_ROWS:
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                rows += buffered
+                buffer, buffered = io.StringIO(), 0
+        if buffered:
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            rows += buffered
+        conn.commit()
+    finally:
+        conn.close()
+    return task, rows, bad
+
+
+def create_staging(session):
+    columns = Listing.__table__.columns
+    definitions = ", ".join(
+        f"{name} {declared_type(columns[name])}" for name in COLUMNS
+    )
+    session.execute(text(f"DROP TABLE IF EXISTS {STAGING}, {MERGE}"))
+    session.execute(
+        text(
+            f"""
+            CREATE UNLOGGED TABLE {STAGING} (
+                ord BIGINT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                raw_data JSONB NOT NULL,
+                {definitions}
+            )
+        """
+        )
+    )
+    session.commit()
+
+
+def drop_staging(session):
+    session.execute(text(f"DROP TABLE IF EXISTS {STAGING}, {MERGE}"))
+    session.commit()
+
+
+def dedupe(session):
+    """Keeps the newest row of every url in the merge table; returns its size."""
+    session.execute(text("SET LOCAL work_mem = '256MB'"))
+    session.execute(
+        text(
+            f"""
+            CREATE UNLOGGED TABLE {MERGE} AS
+            SELECT DISTINCT ON (url) *
+            FROM {STAGING}
+            ORDER BY url, crawled_at DESC NULLS LAST, ord DESC
+        """
+        )
+    )
+    session.execute(text(f"CREATE UNIQUE INDEX ON {MERGE} (url)"))
+    session.execute(text(f"ANALYZE {MERGE}"))
+    count = session.execute(text(f"SELECT count(*) FROM {MERGE}")).scalar()
+    session.commit()
+    return count
+
+
+def ensure_price_partitions(session, now):
+    months = session.execute(
+        text(
+            f"""
+            SELECT DISTINCT date_trunc('month', COALESCE(crawled_at, :now))
+            FROM {MERGE} WHERE price IS NOT NULL
+        """
+        ),
+        {"now": now},
+    ).scalars()
+    price_history.ensure_partitions(session, list(months))
+
+
+def merge_batch(session, after, upto, record_prices, now):
+    """Merges the rows with after < url <= upto; returns the number merged."""
+    names = ", ".join(("created_at", "raw_data") + COLUMNS)
+    updates = ", ".join(
+        f"{name} = COALESCE(EXCLUDED.{name}, listings.{name})"
+        for name in ("raw_data",) + COLUMNS
+        if name != "url"
+    )
+    history = (
+        f"""
+        , history AS (
+            INSERT INTO listing_price_history (listing_id, observed_at, price, source)
+            SELECT id, COALESCE(crawled_at, :now), price, '{price_history.OLX}'
+            FROM merged WHERE price IS NOT NULL
+        )"""
+        if record_prices
+        else ""
+    )
+    merged = session.execute(
+        text(
+            f"""
+            WITH merged AS (
+                INSERT INTO listings ({names})
+                SELECT {names}
+                FROM {MERGE} m
+                WHERE (CAST(:after AS TEXT) IS NULL OR m.url > :after)
+                AND (CAST(:upto AS TEXT) IS NULL OR m.url <= :upto)
+                AND NOT EXISTS (SELECT 1 FROM listings_archive a WHERE a.url = m.url)
+                ORDER BY m.url
+                ON CONFLICT (url) DO UPDATE SET {updates}
+                WHERE (listings.raw_data - 'crawled_at')
+                      IS DISTINCT FROM (EXCLUDED.raw_data - 'crawled_at')
+                AND (listings.crawled_at IS NULL OR EXCLUDED.crawled_at IS NULL
+                     OR EXCLUDED.crawled_at >= listings.crawled_at)
+                RETURNING id, price, crawled_at
+            ){history}
+            SELECT count(*) FROM merged
+        """
+        ),
+        {"after": after, "upto": upto, "now": now},
+    ).scalar()
+    session.commit()
+    return merged
+
+
+def merge(session, total, record_prices=True, batch_size=MERGE_BATCH):
+    now = datetime.datetime.utcnow()
+    if record_prices:
+        ensure_price_partitions(session, now)
+    start = time.monotonic()
+    after, done, merged = None, 0, 0
+    while done < total:
+        upto = session.execute(
+            text(
+                f"""
+                SELECT url FROM {MERGE}
+                WHERE CAST(:after AS TEXT) IS NULL OR url > :after
+                ORDER BY url OFFSET :offset LIMIT 1
+            """
+            ),
+            {"after": after, "offset": batch_size - 1},
+        ).scalar()
+        merged += merge_batch(session, after, upto, record_prices, now)
+        done = total if upto is None else done + batch_size
+        after = upto
+        logging.info(
+            f"pipeline -> import_listings: Merged {done}/{total} urls, "
+            f"{merged} written ({done / (time.monotonic() - start):.0f}/s)"
+        )
+    return merged
+
+
+def import_listings(
+    session, paths, workers=None, record_prices=True, chunk_mb=CHUNK_MB
+):
+    start = time.monotonic()
+    tasks = plan_chunks(paths, chunk_mb * 2**20)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    create_staging(session)
+
+    rows = bad = read_bytes = 0
+    # Readers open their own connections; spawn so none inherits ours
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers or os.cpu_count(), initializer=init_reader) as pool:
+        for (
+            (path, _, chunk_start, chunk_end),
+            chunk_rows,
+            chunk_bad,
+        ) in pool.imap_unordered(load_chunk, tasks):
+            rows += chunk_rows
+            bad += chunk_bad
+            read_bytes += (chunk_end or os.path.getsize(path)) - chunk_start
+            elapsed = time.monotonic() - start
+            logging.info(
+                f"pipeline -> import_listings: Copied {rows} rows, {bad} unreadable, "
+                f"{read_bytes / 2**20:.0f}/{total_bytes / 2**20:.0f} MB "
+                f"({rows / elapsed:.0f} rows/s)"
+            )
+
+    total = dedupe(session)
+    logging.info(f"pipeline -> import_listings: {total} distinct urls in {rows} rows")
+    merged = merge(session, total, record_prices)
+    drop_staging(session)
+    session.execute(text("ANALYZE listings"))
+    session.commit()
+    logging.info(
+        f"pipeline -> import_listings: {merged} listings written from {rows} rows "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help=".ndjson/.jsonl or .csv, may be .gz")
+    parser.add_argument("--workers", type=int, help="reader processes (default: CPUs)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_MB)
+    parser.add_argument("--no-prices", action="store_true")
+    args = parser.parse_args()
+
+    session = init_db()
+    try:
+        import_listings(
+            session, args.paths, args.workers, not args.no_prices, args.chunk_mb
+        )
+    finally:
+        session.close()
@@ -0,0 +1,26 @@
+import datetime
+from config import SOLD_CHECK_FACTOR, SOLD_CHECK_MIN_HOURS, SOLD_CHECK_MAX_DAYS
+
+MIN_INTERVAL = datetime.timedelta(hours=SOLD_CHECK_MIN_HOURS)
+MAX_INTERVAL = datetime.timedelta(days=SOLD_CHECK_MAX_DAYS)
+
+
+def next_check_interval(age_days, median_survival_days=None) -> datetime.timedelta:
+    """
+    Listings predicted to sell quickly are rechecked every few hours; once a
+    listing outlives its prediction the interval grows with its age instead.
+    """
+    horizon = max(age_days, median_survival_days or 0)
+    interval = datetime.timedelta(days=horizon * SOLD_CHECK_FACTOR)
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def next_check_at(created_at, median_survival_days=None, now=None):
+    now = now or datetime.datetime.utcnow()
+    age_days = max((now - created_at).total_seconds() / 86400, 0) if created_at else 0
+    return now + next_check_interval(age_days, median_survival_days)
+
+
+def retry_at(now=None):
+    """When to look again at a listing whose check failed."""
+    return (now or datetime.datetime.utcnow()) + MIN_INTERVAL
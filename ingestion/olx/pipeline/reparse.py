@@ -0,0 +1,71 @@
+"""
+Rebuilds listings from the local page snapshots instead of crawling OLX
+again, e.g. after a parser fix or when a new field is added:
+
+    python -m pipeline.reparse [--since 2024-06-01] [--url-prefix https://...] [--dry-run]
+
+The newest snapshot of every url is parsed with the current parser and
+upserted in batches. Snapshots that carry the full HTML are re-parsed from
+the HTML; the others from their stored JSON-LD and seller link.
+"""
+
+import argparse, datetime, logging, time
+from crawler.listing_http import parse_listing_html
+from crawler.listing_parse import listing_from_fragments
+from storage.bulk_writer import ListingWriter
+from storage.session import init_db
+from storage.snapshots import snapshots
+
+logging.basicConfig(level=logging.INFO)
+
+BATCH_SIZE = 500
+
+
+def reparse(session, since=None, url_prefix=None, dry_run=False):
+    writer = ListingWriter(
+        session, max_rows=BATCH_SIZE, max_seconds=float("inf"), record_prices=False
+    )
+    start = time.monotonic()
+    parsed = failed = 0
+    for url, fetched_at, digest in snapshots.latest(since):
+        if url_prefix and not url.startswith(url_prefix):
+            continue
+        try:
+            fragments = snapshots.load(digest)
+            if fragments.get("html"):
+                data = parse_listing_html(url, [fragments["html"]])
+                data["crawled_at"] = str(fetched_at)
+            else:
+                data = listing_from_fragments(
+                    url, fragments.get("ld"), fragments.get("seller_url"), fetched_at
+                )
+        except Exception as e:
+            failed += 1
+            logging.error(f"pipeline -> reparse: Could not read snapshot of {url}: {e}")
+            continue
+        parsed += 1
+        if not dry_run:
+            writer.add(data)
+        if parsed % 10000 == 0:
+            rate = parsed / (time.monotonic() - start)
+            logging.info(f"pipeline -> reparse: {parsed} parsed ({rate:.0f}/s)")
+    if not dry_run:
+        writer.flush()
+    logging.info(
+        f"pipeline -> reparse: {parsed} parsed, {failed} unreadable, "
+        f"{len(writer.written)} written in {time.monotonic() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--url-prefix")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    session = init_db()
+    try:
+        reparse(session, args.since, args.url_prefix, args.dry_run)
+    finally:
+        session.close()
@@ -1,4 +1,5 @@
 import asyncio, datetime, random
+from crawler.runtime import CrawlerRuntime
 from .run_once import run_once
 import logging
 
@@ -6,13 +7,19 @@ logging.basicConfig(level=logging.INFO)
 
 
 async def service_loop():
-    while True:
-        logging.info(f"pipeline -> service: Cycle start: {datetime.datetime.now()}")
-        try:
-            await run_once()
-        except Exception as e:
-            logging.error(f"pipeline -> service: CRITICAL ERROR: {e}")
+    async with CrawlerRuntime() as runtime:
+        while True:
+            logging.info(f"pipeline -> service: Cycle start: {datetime.datetime.now()}")
+            try:
+                await run_once(runtime)
+            except Exception as e:
+                logging.error(f"pipeline -> service: CRITICAL ERROR: {e}")
 
-        sleep = random.uniform(1500, 2700)
-        logging.info(f"pipeline -> service: Sleeping {sleep/60:.1f} minutes")
-        await asyncio.sleep(sleep)
+            try:
+                await runtime.maybe_recycle()
+            except Exception as e:
+                logging.error(f"pipeline -> service: Could not recycle browser: {e}")
+
+            sleep = random.uniform(1500, 2700)
+            logging.info(f"pipeline -> service: Sleeping {sleep/60:.1f} minutes")
+            await asyncio.sleep(sleep)
@@ -0,0 +1,119 @@
+import logging
+from config import OLX_MAX_PAGES, DUPLICATE_STOP
+from crawler.heartbeat import update_heartbeat
+from crawler.listing_page import extract_listing_details
+from crawler.category_page import extract_listing_urls, category_page_url
+from storage.bulk_writer import AsyncListingWriter
+from storage.async_repository import (
+    find_known_urls,
+    get_watermark,
+    save_checkpoint,
+    complete_walk,
+)
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def crawl_listings(session, pool, urls, client=None):
+    """
+    Fetches listing details on the page pool and hands them to a buffered
+    writer as they arrive; whatever is still buffered is flushed at the end.
+    Returns the exception raised for each url, or None where it was saved.
+    """
+    writer = AsyncListingWriter(session)
+
+    async def crawl(page, url):
+        await writer.add(await extract_listing_details(page, url, client))
+
+    results = await pool.map(urls, crawl)
+    try:
+        await writer.flush()
+    except Exception:
+        pass
+
+    errors = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logging.error(f"pipeline -> walk_category: Error crawling {url}: {result}")
+            errors.append(result)
+        elif url not in writer.written:
+            errors.append(writer.last_error)
+        else:
+            errors.append(None)
+    logging.info(
+        f"pipeline -> walk_category: Saved {len(writer.written)} of {len(urls)} listings"
+    )
+    return errors
+
+
+def reached_seen_territory(urls, known, newest_url):
+    """True once the page shows the last walk's newest listing or a run of stored ones."""
+    if newest_url and newest_url in urls:
+        return True
+    consecutive_duplicates = 0
+    for url in urls:
+        if url in known:
+            consecutive_duplicates += 1
+            if consecutive_duplicates >= DUPLICATE_STOP:
+                return True
+        else:
+            consecutive_duplicates = 0
+    return False
+
+
+async def walk_category(session, page, category_url, handle_new_urls):
+    """
+    Pages through a category sorted by newest first, passing unseen listing
+    urls to `await handle_new_urls(urls)`, until it reaches listings seen by
+    the previous walk. The page reached is checkpointed after every page so
+    an interrupted walk resumes where it stopped.
+    """
+    watermark = await get_watermark(session, category_url)
+    page_number = watermark.next_page or 1
+    pending_newest_url = watermark.pending_newest_url
+    if page_number > 1:
+        logging.info(
+            f"pipeline -> walk_category: Resuming {category_url} at page {page_number}"
+        )
+
+    while page_number <= OLX_MAX_PAGES:
+        update_heartbeat()
+        current_url = category_page_url(category_url, page_number)
+        logging.info(
+            f"pipeline -> walk_category: --- Processing {category_url} Page {page_number} ---"
+        )
+
+        try:
+            # [] only past the last page; a timeout or error page raises, and
+            # must not complete the walk or the listings before the watermark
+            # would never be seen
+            urls = await extract_listing_urls(page, current_url)
+        except Exception as e:
+            logging.error(
+                f"pipeline -> walk_category: Error loading {current_url}, "
+                f"will resume at page {page_number}: {e}"
+            )
+            return
+        if not urls:
+            break
+
+        known = await find_known_urls(session, urls)
+        new_urls = [url for url in urls if url not in known]
+        logging.info(
+            f"pipeline -> walk_category: {len(new_urls)} new of {len(urls)} urls"
+        )
+        if pending_newest_url is None and new_urls:
+            pending_newest_url = new_urls[0]
+
+        if new_urls:
+            await handle_new_urls(new_urls)
+
+        if reached_seen_territory(urls, known, watermark.newest_url):
+            logging.info(f"pipeline -> walk_category: Reached seen listings, stopping")
+            break
+
+        page_number += 1
+        await save_checkpoint(session, watermark, page_number, pending_newest_url)
+
+    watermark.pending_newest_url = pending_newest_url
+    await complete_walk(session, watermark)
@@ -0,0 +1,152 @@
+"""
+Runs a single crawler stage as its own process so each stage can be scaled
+on its own:
+
+    python -m pipeline.worker discover   # walk categories, enqueue new listing urls
+    python -m pipeline.worker details    # fetch and save queued listings
+    python -m pipeline.worker prices     # Ceneo new-price lookups
+    python -m pipeline.worker sold       # sold-status rechecks
+    python -m pipeline.worker archive    # move long-sold listings to the archive
+
+Stages hand work over through Postgres (the jobs table, price_lookups and
+listings.next_check_at), always claimed with FOR UPDATE SKIP LOCKED, so any
+stage can run as several replicas.
+"""
+
+import asyncio, logging, os, socket, sys
+from config import (
+    OLX_URLS,
+    CRAWL_WORKERS,
+    HTTP_FAST_PATH,
+    WORKER_BATCH_SIZE,
+    WORKER_IDLE_SECONDS,
+    DISCOVER_INTERVAL_SECONDS,
+    ARCHIVE_INTERVAL_SECONDS,
+)
+from crawler.heartbeat import update_heartbeat
+from crawler.runtime import CrawlerRuntime
+from storage.session import init_async_db
+from storage.async_repository import load_known_urls, archive_sold
+from storage import async_jobs as jobs
+from pipeline.walk_category import walk_category, crawl_listings
+from pipeline.check_new_prices import check_new_prices_batch
+from pipeline.check_sold import check_sold_listings
+
+logging.basicConfig(level=logging.INFO)
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def discover(session, runtime):
+    """Walks every category and queues the unseen listings for the details stage."""
+
+    async def enqueue_urls(urls):
+        await jobs.enqueue(
+            session, jobs.LISTING_DETAILS, [(url, {"url": url}) for url in urls]
+        )
+        logging.info(f"pipeline -> worker: Queued {len(urls)} listings")
+
+    await load_known_urls(session)
+    while True:
+        for category_url in OLX_URLS:
+            try:
+                await walk_category(session, runtime.page, category_url, enqueue_urls)
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"pipeline -> worker: Error walking {category_url}: {e}")
+        await jobs.purge_failed(session, jobs.LISTING_DETAILS)
+        await jobs.queue_depth(session, jobs.LISTING_DETAILS)
+        update_heartbeat()
+        await runtime.maybe_recycle()
+        await asyncio.sleep(DISCOVER_INTERVAL_SECONDS)
+
+
+async def details(session, runtime):
+    """Claims queued listing urls and crawls them on the page pool."""
+    client = runtime.client if HTTP_FAST_PATH else None
+    await load_known_urls(session)
+    while True:
+        update_heartbeat()
+        claimed = await jobs.claim(
+            session, jobs.LISTING_DETAILS, WORKER_ID, WORKER_BATCH_SIZE
+        )
+        if not claimed:
+            await asyncio.sleep(WORKER_IDLE_SECONDS)
+            continue
+
+        urls = [payload["url"] for _, payload, _ in claimed]
+        errors = await crawl_listings(session, runtime.pool, urls, client)
+        await jobs.complete(
+            session,
+            [job_id for (job_id, _, _), e in zip(claimed, errors) if e is None],
+        )
+        for (job_id, _, _), error in zip(claimed, errors):
+            if error is not None:
+                await jobs.fail(session, job_id, str(error))
+        await runtime.maybe_recycle()
+
+
+async def prices(session, runtime):
+    """Keeps working through due Ceneo lookups."""
+    while True:
+        update_heartbeat()
+        if not await check_new_prices_batch(
+            session, runtime.page, limit=WORKER_BATCH_SIZE
+        ):
+            await asyncio.sleep(WORKER_IDLE_SECONDS)
+        await runtime.maybe_recycle()
+
+
+async def sold(session, runtime):
+    """Keeps working through due sold checks."""
+    while True:
+        update_heartbeat()
+        if not await check_sold_listings(
+            session, runtime.page, batch_size=200, client=runtime.client
+        ):
+            await asyncio.sleep(WORKER_IDLE_SECONDS)
+        await runtime.maybe_recycle()
+
+
+async def archive(session, runtime):
+    """Moves listings sold long ago out of the hot table, in bounded batches."""
+    while True:
+        update_heartbeat()
+        await archive_sold(session)
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+STAGES = {
+    "discover": discover,
+    "details": details,
+    "prices": prices,
+    "sold": sold,
+    "archive": archive,
+}
+
+# Stages that only talk to the database
+NO_BROWSER = {"archive"}
+
+
+async def main(stage):
+    session = await init_async_db()
+    logging.info(f"pipeline -> worker: {WORKER_ID} running stage {stage}")
+    try:
+        if stage in NO_BROWSER:
+            await STAGES[stage](session, None)
+            return
+        # Only the details stage crawls on the page pool
+        pool_size = CRAWL_WORKERS if stage == "details" else 1
+        async with CrawlerRuntime(pool_size) as runtime:
+            await STAGES[stage](session, runtime)
+    finally:
+        await session.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in STAGES:
+        sys.exit(f"usage: python -m pipeline.worker {{{'|'.join(STAGES)}}}")
+    try:
+        asyncio.run(main(sys.argv[1]))
+    except KeyboardInterrupt:
+        print("Worker stopped.")
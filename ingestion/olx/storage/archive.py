@@ -0,0 +1,95 @@
+import datetime, logging
+from sqlalchemy import text
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+def archived_columns(session):
+    """Columns listings and listings_archive have in common, in listings order."""
+    if not hasattr(archived_columns, "names"):
+        rows = session.execute(
+            text(
+                """
+                SELECT l.column_name
+                FROM information_schema.columns l
+                JOIN information_schema.columns a
+                  ON a.table_name = 'listings_archive' AND a.column_name = l.column_name
+                WHERE l.table_name = 'listings'
+                ORDER BY l.ordinal_position
+            """
+            )
+        ).fetchall()
+        archived_columns.names = [name for (name,) in rows]
+    return archived_columns.names
+
+
+def archive_batch(session, after_days=ARCHIVE_AFTER_DAYS, limit=ARCHIVE_BATCH_SIZE):
+    """
+    Moves up to `limit` listings sold more than `after_days` ago into
+    listings_archive, in one short transaction. Rows locked by another
+    transaction are skipped. An id already in the archive fails the whole
+    batch, so no listing is deleted without being archived. Returns the
+    number of listings moved.
+    """
+    now = datetime.datetime.utcnow()
+    columns = ", ".join(f'"{name}"' for name in archived_columns(session))
+    session.execute(text("SET LOCAL lock_timeout = '2s'"))
+    rows = session.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM listings
+                WHERE id IN (
+                    SELECT id FROM listings
+                    WHERE sold_at < :cutoff
+                    ORDER BY sold_at
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {columns}
+            ), archived AS (
+                INSERT INTO listings_archive ({columns}, archived_at)
+                SELECT {columns}, :now FROM moved
+            )
+            SELECT id FROM moved
+        """
+        ),
+        {
+            "cutoff": now - datetime.timedelta(days=after_days),
+            "limit": limit,
+            "now": now,
+        },
+    ).fetchall()
+    moved = [listing_id for (listing_id,) in rows]
+    if moved:
+        session.execute(
+            text("DELETE FROM price_lookups WHERE listing_id = ANY(:ids)"),
+            {"ids": moved},
+        )
+        session.execute(
+            text("DELETE FROM listing_predictions WHERE listing_id = ANY(:ids)"),
+            {"ids": moved},
+        )
+        session.execute(
+            text("DELETE FROM embedding_claims WHERE listing_id = ANY(:ids)"),
+            {"ids": moved},
+        )
+    session.commit()
+    return len(moved)
+
+
+def archive_sold(session, max_batches=None):
+    """Archives batch after batch until nothing is due (or `max_batches` ran)."""
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        try:
+            moved = archive_batch(session)
+        except Exception as e:
+            session.rollback()
+            logging.error(f"storage -> archive: Archive batch failed: {e}")
+            break
+        total += moved
+        batches += 1
+        if moved < ARCHIVE_BATCH_SIZE:
+            break
+    logging.info(f"storage -> archive: Archived {total} sold listings")
+    return total
@@ -0,0 +1,12 @@
+"""The job queue functions of jobs.py, taking an AsyncSession."""
+
+from .async_repository import awaitable
+from .jobs import LISTING_DETAILS
+from . import jobs
+
+enqueue = awaitable(jobs.enqueue)
+claim = awaitable(jobs.claim)
+complete = awaitable(jobs.complete)
+fail = awaitable(jobs.fail)
+purge_failed = awaitable(jobs.purge_failed)
+queue_depth = awaitable(jobs.queue_depth)
@@ -0,0 +1,39 @@
+"""
+The functions of repository.py for the asyncio crawler, taking an
+AsyncSession from storage.session.init_async_db. Each one runs the same
+statements through AsyncSession.run_sync on the asyncpg driver, so a
+coroutine waiting on Postgres leaves the event loop to the page loads.
+"""
+
+import functools
+from . import archive, repository
+
+
+def awaitable(fn):
+    """`fn(session, ...)` as a coroutine function of an AsyncSession."""
+
+    @functools.wraps(fn)
+    async def wrapper(session, *args, **kwargs):
+        return await session.run_sync(fn, *args, **kwargs)
+
+    return wrapper
+
+
+save_raw_listing = awaitable(repository.save_raw_listing)
+load_known_urls = awaitable(repository.load_known_urls)
+find_known_urls = awaitable(repository.find_known_urls)
+listing_exists = awaitable(repository.listing_exists)
+get_due_listings = awaitable(repository.get_due_listings)
+schedule_rechecks = awaitable(repository.schedule_rechecks)
+mark_as_sold = awaitable(repository.mark_as_sold)
+get_listings_without_new_price = awaitable(repository.get_listings_without_new_price)
+update_listing_new_price = awaitable(repository.update_listing_new_price)
+update_listing_new_price_not_found = awaitable(
+    repository.update_listing_new_price_not_found
+)
+get_watermark = awaitable(repository.get_watermark)
+save_checkpoint = awaitable(repository.save_checkpoint)
+complete_walk = awaitable(repository.complete_walk)
+get_cached_offers = awaitable(repository.get_cached_offers)
+store_offers = awaitable(repository.store_offers)
+archive_sold = awaitable(archive.archive_sold)
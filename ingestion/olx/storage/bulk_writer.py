@@ -0,0 +1,156 @@
+import asyncio, datetime, json, logging, time
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.dialects.postgresql import insert
+from config import LISTING_FLUSH_SIZE, LISTING_FLUSH_SECONDS
+from .listing_columns import typed_columns
+from .known_urls import known_urls
+from . import price_history
+
+
+class ListingWriter:
+    """
+    Buffers crawled listings and upserts them in batches, with a single
+    INSERT ... ON CONFLICT (url) DO UPDATE per batch.
+
+    A batch is flushed once it holds `max_rows` listings or its oldest
+    listing has waited `max_seconds`; callers flush the rest when done.
+    Re-parsed listings are written with `record_prices=False`, since their
+    prices are not new observations.
+
+    Urls written successfully are collected in `written`; the error of the
+    last failed flush is kept in `last_error`.
+    """
+
+    def __init__(
+        self,
+        session,
+        max_rows=LISTING_FLUSH_SIZE,
+        max_seconds=LISTING_FLUSH_SECONDS,
+        record_prices=True,
+    ):
+        self.session = session
+        self.record_prices = record_prices
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.buffer = {}
+        self.first_added = None
+        self.written = set()
+        self.last_error = None
+
+    def add(self, data: dict):
+        self.buffer_listing(data)
+        if self.due():
+            self.flush()
+
+    def buffer_listing(self, data: dict):
+        url = data.get("url")
+        if not url:
+            raise ValueError("listing has no url")
+        if not self.buffer:
+            self.first_added = time.monotonic()
+        # A listing crawled twice in one batch keeps its latest version
+        self.buffer[url] = data
+
+    def due(self):
+        return bool(self.buffer) and (
+            len(self.buffer) >= self.max_rows
+            or time.monotonic() - self.first_added >= self.max_seconds
+        )
+
+    def flush(self):
+        batch, self.buffer = self.buffer, {}
+        if not batch:
+            return
+        try:
+            write_listings(self.session, list(batch.values()), self.record_prices)
+        except Exception as e:
+            self.session.rollback()
+            self.failed(batch, e)
+            raise
+        self.done(batch)
+
+    def failed(self, batch, error):
+        self.last_error = error
+        logging.error(
+            f"storage -> bulk_writer: Failed to write {len(batch)} listings: {error}"
+        )
+
+    def done(self, batch):
+        self.written.update(batch)
+        for url in batch:
+            known_urls.add(url)
+        logging.info(f"storage -> bulk_writer: Wrote {len(batch)} listings")
+
+
+class AsyncListingWriter(ListingWriter):
+    """
+    ListingWriter on an AsyncSession, shared by the crawl coroutines of a
+    batch. add() and flush() are awaited; flushes take turns, since a session
+    runs one statement at a time.
+    """
+
+    def __init__(self, session, **kwargs):
+        super().__init__(session, **kwargs)
+        self.lock = asyncio.Lock()
+
+    async def add(self, data: dict):
+        self.buffer_listing(data)
+        if self.due():
+            await self.flush()
+
+    async def flush(self):
+        async with self.lock:
+            batch, self.buffer = self.buffer, {}
+            if not batch:
+                return
+            try:
+                await self.session.run_sync(
+                    write_listings, list(batch.values()), self.record_prices
+                )
+            except Exception as e:
+                await self.session.rollback()
+                self.failed(batch, e)
+                raise
+            self.done(batch)
+
+
+def write_listings(session, listings, record_prices=True):
+    """
+    Upserts `listings` by url into their typed columns and raw_data and, with
+    `record_prices`, appends their prices to the price history. An existing row keeps its id
+    and created_at, and is not rewritten when only crawled_at changed. Only
+    rows the upsert wrote, and whose price moved since the last recorded
+    one, get a history row, so history grows with price changes rather than
+    with crawls.
+    """
+    now = datetime.datetime.utcnow()
+    rows = []
+    for data in listings:
+        row = typed_columns(data)
+        row["raw_data"] = json.dumps(data)
+        row["created_at"] = now
+        rows.append(row)
+
+    names = sorted({name for row in rows for name in row})
+    listings_table = table("listings", *(column(name) for name in names))
+    stmt = insert(listings_table).values(
+        [{name: row.get(name) for name in names} for row in rows]
+    )
+    # Fields a listing does not carry arrive as NULL and keep their stored value
+    written = session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["url"],
+            set_={
+                name: func.coalesce(stmt.excluded[name], listings_table.c[name])
+                for name in names
+                if name not in ("url", "created_at")
+            },
+            where=text(
+                "(listings.raw_data - 'crawled_at') "
+                "IS DISTINCT FROM (excluded.raw_data - 'crawled_at')"
+            ),
+        ).returning(literal_column("listings.id"), literal_column("listings.price"))
+    ).fetchall()
+    if record_prices:
+        price_history.append(session, price_history.OLX, written, changed_only=True)
+    session.commit()
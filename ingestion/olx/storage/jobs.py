@@ -0,0 +1,155 @@
+import datetime, json, logging
+from sqlalchemy import text
+from config import (
+    JOB_FAILED_RETENTION_DAYS,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_SECONDS,
+)
+
+LISTING_DETAILS = "listing_details"
+
+
+def enqueue(session, queue: str, jobs):
+    """
+    Adds `(dedupe_key, payload)` jobs to `queue`. A job whose key is already
+    queued or running is skipped.
+    """
+    if not jobs:
+        return
+    now = datetime.datetime.utcnow()
+    session.execute(
+        text(
+            """
+            INSERT INTO jobs (queue, dedupe_key, payload, status, attempts, max_attempts, run_at, created_at)
+            VALUES (:queue, :dedupe_key, CAST(:payload AS JSONB), 'queued', 0, :max_attempts, :now, :now)
+            ON CONFLICT (queue, dedupe_key) WHERE status IN ('queued', 'running')
+            DO NOTHING
+        """
+        ),
+        [
+            {
+                "queue": queue,
+                "dedupe_key": key,
+                "payload": json.dumps(payload),
+                "max_attempts": JOB_MAX_ATTEMPTS,
+                "now": now,
+            }
+            for key, payload in jobs
+        ],
+    )
+    session.commit()
+
+
+def claim(session, queue: str, worker_id: str, limit: int):
+    """
+    Leases up to `limit` runnable jobs to `worker_id` and returns their
+    (id, payload, attempts). Jobs whose lease expired, because their worker
+    died, are runnable again until they run out of attempts.
+    """
+    now = datetime.datetime.utcnow()
+    session.execute(
+        text(
+            """
+            UPDATE jobs
+            SET status = 'failed', last_error = 'lease expired', locked_by = NULL,
+                run_at = :now
+            WHERE queue = :queue AND status = 'running'
+            AND lease_until < :now AND attempts >= max_attempts
+        """
+        ),
+        {"queue": queue, "now": now},
+    )
+    rows = session.execute(
+        text(
+            """
+            UPDATE jobs
+            SET status = 'running', locked_by = :worker_id,
+                lease_until = :lease_until, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM jobs
+                WHERE queue = :queue
+                AND (
+                    (status = 'queued' AND run_at <= :now)
+                    OR (status = 'running' AND lease_until < :now)
+                )
+                ORDER BY run_at
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, payload, attempts
+        """
+        ),
+        {
+            "queue": queue,
+            "worker_id": worker_id,
+            "now": now,
+            "lease_until": now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+            "limit": limit,
+        },
+    ).fetchall()
+    session.commit()
+    return rows
+
+
+def complete(session, job_ids):
+    if job_ids:
+        session.execute(
+            text("DELETE FROM jobs WHERE id = ANY(:ids)"), {"ids": list(job_ids)}
+        )
+        session.commit()
+
+
+def fail(session, job_id: int, error: str):
+    """Requeues the job with exponential backoff, or marks it failed for good."""
+    session.execute(
+        text(
+            """
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                run_at = CAST(:now AS TIMESTAMP)
+                         + :base * power(2, attempts - 1) * interval '1 second',
+                last_error = :error, locked_by = NULL, lease_until = NULL
+            WHERE id = :id
+        """
+        ),
+        {
+            "id": job_id,
+            "error": error[:2000],
+            "base": JOB_RETRY_BASE_SECONDS,
+            "now": datetime.datetime.utcnow(),
+        },
+    )
+    session.commit()
+
+
+def purge_failed(session, queue: str):
+    """
+    Deletes jobs of `queue` that failed for good more than
+    JOB_FAILED_RETENTION_DAYS ago, so they stay inspectable for a while but
+    do not pile up. Returns how many were deleted.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(
+        days=JOB_FAILED_RETENTION_DAYS
+    )
+    deleted = session.execute(
+        text(
+            "DELETE FROM jobs WHERE queue = :queue AND status = 'failed' AND run_at < :cutoff"
+        ),
+        {"queue": queue, "cutoff": cutoff},
+    ).rowcount
+    session.commit()
+    if deleted:
+        logging.info(f"storage -> jobs: Purged {deleted} failed {queue} jobs")
+    return deleted
+
+
+def queue_depth(session, queue: str) -> dict:
+    """Job counts per status for `queue`."""
+    rows = session.execute(
+        text("SELECT status, COUNT(*) FROM jobs WHERE queue = :queue GROUP BY status"),
+        {"queue": queue},
+    ).fetchall()
+    depth = {status: count for status, count in rows}
+    logging.info(f"storage -> jobs: {queue} depth {depth}")
+    return depth
@@ -0,0 +1,47 @@
+import hashlib, logging
+from sqlalchemy import text
+
+
+class KnownUrls:
+    """
+    In-process set of 8-byte fingerprints of listing URLs already stored.
+    Loaded once per process and kept current by the save path, so pages of
+    already-seen listings can be recognised without querying the database.
+    """
+
+    def __init__(self):
+        self.fingerprints = set()
+        self.loaded = False
+
+    @staticmethod
+    def fingerprint(url):
+        return hashlib.blake2b(url.encode(), digest_size=8).digest()
+
+    def load(self, session):
+        result = session.execute(
+            text(
+                """
+                SELECT url FROM listings WHERE url IS NOT NULL
+                UNION ALL
+                SELECT url FROM listings_archive WHERE url IS NOT NULL
+            """
+            ),
+            execution_options={"stream_results": True, "yield_per": 10000},
+        )
+        for url in result.scalars():
+            self.fingerprints.add(self.fingerprint(url))
+        self.loaded = True
+        logging.info(f"storage -> known_urls: Loaded {len(self.fingerprints)} urls")
+
+    def add(self, url):
+        if url:
+            self.fingerprints.add(self.fingerprint(url))
+
+    def __contains__(self, url):
+        return self.fingerprint(url) in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+
+known_urls = KnownUrls()
@@ -0,0 +1,62 @@
+import datetime, json, logging
+from sqlalchemy import Boolean, DateTime, Float, Integer
+from .models import Listing
+
+
+def flatten_json(y):
+    out = {}
+
+    def flatten(x, name=""):
+        if isinstance(x, dict):
+            for a in x:
+                flatten(x[a], name + a + "_")
+        elif isinstance(x, list):
+            if x:
+                out[name[:-1]] = x[0]
+        else:
+            out[name[:-1]] = x
+
+    flatten(y)
+    return out
+
+
+def column_name(key):
+    return "".join(c if c.isalnum() else "_" for c in key).lower() or "unknown_field"
+
+
+def coerce(column, value):
+    """`value` converted to the column's type, or None when it does not fit."""
+    if value is None:
+        return None
+    try:
+        if isinstance(column.type, Boolean):
+            return value if isinstance(value, bool) else str(value).lower() == "true"
+        if isinstance(column.type, Integer):
+            return int(value)
+        if isinstance(column.type, Float):
+            return float(value)
+        if isinstance(column.type, DateTime):
+            if isinstance(value, datetime.datetime):
+                return value
+            return datetime.datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        logging.warning(
+            f"storage -> listing_columns: Dropping {column.name}={value!r}, "
+            f"not a {column.type}"
+        )
+        return None
+    return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+
+
+def typed_columns(data: dict) -> dict:
+    """
+    The flattened listing fields that have a declared column, converted to
+    its type. Other keys are only kept in raw_data.
+    """
+    columns = Listing.__table__.columns
+    row = {}
+    for key, value in flatten_json(data).items():
+        name = column_name(key)
+        if name in columns and name not in ("id", "created_at", "raw_data"):
+            row[name] = coerce(columns[name], value)
+    return row
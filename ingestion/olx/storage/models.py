@@ -1,5 +1,15 @@
 import datetime
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Float,
+    Text,
+    Index,
+    text,
+)
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -7,8 +17,130 @@ Base = declarative_base()
 
 
 class Listing(Base):
+    """
+    A crawled listing. Fields the pipeline reads have typed columns; the full
+    crawled document, including any key without a column, stays in raw_data.
+    """
+
     __tablename__ = "listings"
 
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     raw_data = Column(JSONB)
+
+    # Crawled fields, filled from raw_data by the listing writer
+    url = Column(Text)
+    crawled_at = Column(DateTime)
+    name = Column(Text)
+    description = Column(Text)
+    category = Column(Text)
+    image = Column(Text)
+    sku = Column(Text)
+    city = Column(Text)
+    price = Column(Integer)
+    condition = Column(Text)
+    seller_id = Column(Text)
+
+    # Sold checks and Ceneo lookups
+    sold_at = Column(DateTime)
+    last_checked_at = Column(DateTime)
+    next_check_at = Column(DateTime)
+    price_new = Column(Float)
+
+    # Written by the API and the ML models; predictions themselves live in
+    # listing_predictions
+    is_pending_repricing = Column(Boolean, server_default=text("false"))
+    is_illiquid = Column(Boolean, server_default=text("false"))
+    is_invalid = Column(Boolean, server_default=text("false"))
+
+
+class CategoryWatermark(Base):
+    """Progress of the category walker, one row per start URL."""
+
+    __tablename__ = "category_watermarks"
+
+    category_url = Column(Text, primary_key=True)
+    # Newest listing seen by the last completed walk; walks stop when they reach it
+    newest_url = Column(Text)
+    # Checkpoint of a walk in progress, cleared when the walk completes
+    next_page = Column(Integer)
+    pending_newest_url = Column(Text)
+    updated_at = Column(
+        DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+
+
+class CeneoPriceCache(Base):
+    """Ceneo offer prices per normalized product query."""
+
+    __tablename__ = "ceneo_price_cache"
+
+    query_key = Column(Text, primary_key=True)
+    # Raw offer prices; an empty list records that Ceneo found nothing
+    offers = Column(JSONB, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class PriceLookup(Base):
+    """Retry state of listings whose Ceneo lookup has not succeeded yet."""
+
+    __tablename__ = "price_lookups"
+
+    listing_id = Column(Integer, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    # NULL once the listing has used up its attempts
+    next_attempt_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index(
+            "price_lookups_due_idx",
+            "next_attempt_at",
+            postgresql_where=next_attempt_at.isnot(None),
+        ),
+    )
+
+
+class Job(Base):
+    """Work handed from one crawler stage to another, claimed with SKIP LOCKED."""
+
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger, primary_key=True)
+    queue = Column(Text, nullable=False)
+    # Jobs with the same key are not enqueued twice while one is pending
+    dedupe_key = Column(Text)
+    payload = Column(JSONB, nullable=False)
+    # queued -> running -> (deleted when done) | queued again | failed
+    status = Column(Text, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_by = Column(Text)
+    lease_until = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index(
+            "jobs_queued_idx",
+            "queue",
+            "run_at",
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index(
+            "jobs_running_idx",
+            "queue",
+            "lease_until",
+            postgresql_where=text("status = 'running'"),
+        ),
+        Index(
+            "jobs_pending_key_idx",
+            "queue",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
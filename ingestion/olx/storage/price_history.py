@@ -0,0 +1,170 @@
+"""
+Append-only price observations in listing_price_history, partitioned by
+month (see db/migrations/V004__listing_price_history.sql).
+
+    python -m storage.price_history drops [--min-ratio 0.1] [--limit 50]
+    python -m storage.price_history drop-before 2024-01
+"""
+
+import argparse, datetime, logging
+from sqlalchemy import text
+
+OLX = "olx"
+CENEO = "ceneo"
+
+# Months whose partition this process already made sure of
+_partitions = set()
+
+
+def ensure_partitions(session, timestamps):
+    """Creates missing monthly partitions, committed on their own connection."""
+    for month in {(t.year, t.month) for t in timestamps} - _partitions:
+        with session.get_bind().begin() as conn:
+            conn.execute(
+                text("SELECT create_price_history_partition(:month)"),
+                {"month": datetime.datetime(*month, 1)},
+            )
+        _partitions.add(month)
+
+
+def append(session, source: str, observations, changed_only=False):
+    """
+    Appends (listing_id, price) observations made now. With `changed_only`,
+    an observation equal to the last price recorded for the listing from
+    `source` is skipped. Runs in the caller's transaction; the caller commits.
+    """
+    observations = [(i, p) for i, p in observations if p is not None]
+    if not observations:
+        return
+    now = datetime.datetime.utcnow()
+    ensure_partitions(session, [now])
+    changed_clause = (
+        """
+        WHERE v.price IS DISTINCT FROM (
+            SELECT h.price FROM listing_price_history h
+            WHERE h.listing_id = v.listing_id AND h.source = :source
+            ORDER BY h.observed_at DESC
+            LIMIT 1
+        )
+    """
+        if changed_only
+        else ""
+    )
+    session.execute(
+        text(
+            f"""
+            INSERT INTO listing_price_history (listing_id, observed_at, price, source)
+            SELECT v.listing_id, :now, v.price, :source
+            FROM unnest(CAST(:ids AS INTEGER[]), CAST(:prices AS DOUBLE PRECISION[]))
+                AS v(listing_id, price)
+            {changed_clause}
+        """
+        ),
+        {
+            "now": now,
+            "source": source,
+            "ids": [i for i, _ in observations],
+            "prices": [float(p) for _, p in observations],
+        },
+    )
+
+
+def price_drops(session, min_ratio=0.0, since=None, limit=100):
+    """
+    Unsold listings whose latest OLX price is below the first one seen, as
+    (listing_id, first_price, last_price, drop_ratio, first_seen, last_seen),
+    biggest relative drop first. `since` limits the scan to newer partitions.
+    """
+    since_clause = "AND observed_at >= :since" if since else ""
+    return session.execute(
+        text(
+            f"""
+            WITH observed AS (
+                SELECT listing_id,
+                       (array_agg(price ORDER BY observed_at))[1] AS first_price,
+                       (array_agg(price ORDER BY observed_at DESC))[1] AS last_price,
+                       min(observed_at) AS first_seen,
+                       max(observed_at) AS last_seen
+                FROM listing_price_history
+                WHERE source = :source {since_clause}
+                GROUP BY listing_id
+            )
+            SELECT o.listing_id, o.first_price, o.last_price,
+                   1 - o.last_price / o.first_price AS drop_ratio,
+                   o.first_seen, o.last_seen
+            FROM observed o
+            JOIN listings l ON l.id = o.listing_id
+            WHERE l.sold_at IS NULL
+            AND o.first_price > 0
+            AND o.last_price < o.first_price * (1 - :min_ratio)
+            ORDER BY drop_ratio DESC
+            LIMIT :limit
+        """
+        ),
+        {"source": OLX, "since": since, "min_ratio": min_ratio, "limit": limit},
+    ).fetchall()
+
+
+def listing_price_history(session, listing_id: int, source=OLX):
+    """(observed_at, price) of one listing, oldest first."""
+    return session.execute(
+        text(
+            """
+            SELECT observed_at, price
+            FROM listing_price_history
+            WHERE listing_id = :listing_id AND source = :source
+            ORDER BY observed_at
+        """
+        ),
+        {"listing_id": listing_id, "source": source},
+    ).fetchall()
+
+
+def drop_partitions_before(session, month: datetime.datetime):
+    """Drops the monthly partitions that end on or before `month`."""
+    rows = session.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'listing_price_history'::regclass
+            AND c.relname < :name
+        """
+        ),
+        {"name": f"listing_price_history_{month:%Y_%m}"},
+    ).fetchall()
+    for (name,) in rows:
+        logging.info(f"storage -> price_history: Dropping partition {name}")
+        session.execute(text(f'DROP TABLE "{name}"'))
+        _partitions.discard(tuple(int(x) for x in name.rsplit("_", 2)[1:]))
+    session.commit()
+    return [name for (name,) in rows]
+
+
+if __name__ == "__main__":
+    from .session import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    drops_cmd = sub.add_parser("drops", help="listings priced below their first price")
+    drops_cmd.add_argument("--min-ratio", type=float, default=0.0)
+    drops_cmd.add_argument("--limit", type=int, default=50)
+    drop_cmd = sub.add_parser("drop-before", help="drop partitions older than YYYY-MM")
+    drop_cmd.add_argument("month")
+    args = parser.parse_args()
+
+    session = init_db()
+    try:
+        if args.command == "drops":
+            for row in price_drops(session, args.min_ratio, limit=args.limit):
+                print(
+                    f"{row.listing_id}: {row.first_price:.0f} -> {row.last_price:.0f} "
+                    f"(-{row.drop_ratio:.0%}) since {row.first_seen:%Y-%m-%d}"
+                )
+        else:
+            month = datetime.datetime.strptime(args.month, "%Y-%m")
+            print(f"dropped {len(drop_partitions_before(session, month))} partitions")
+    finally:
+        session.close()
@@ -1,39 +1,122 @@
 import datetime, logging
 from sqlalchemy import text
-from .dynamic_columns import save_dynamic_listing
+from sqlalchemy.dialects.postgresql import insert
+from .bulk_writer import ListingWriter
+from .known_urls import known_urls
+from . import price_history
+from .models import CategoryWatermark, CeneoPriceCache
+from config import (
+    CENEO_CACHE_TTL_HOURS,
+    CENEO_CACHE_EMPTY_TTL_HOURS,
+    PRICE_LOOKUP_BASE_HOURS,
+    PRICE_LOOKUP_MAX_ATTEMPTS,
+    JOB_LEASE_SECONDS,
+)
+
+# Status updates take commit=False so that a batch of them shares one commit
 
 
 def save_raw_listing(session, data):
-    save_dynamic_listing(session, data)
+    """Upserts a single listing; crawl batches should use a ListingWriter."""
+    writer = ListingWriter(session)
+    writer.add(data)
+    writer.flush()
+
+
+def load_known_urls(session):
+    """Fills the in-process known-URL filter once per process."""
+    if not known_urls.loaded:
+        known_urls.load(session)
+
+
+def find_known_urls(session, urls) -> set:
+    """
+    Returns the subset of `urls` already stored. URLs found in the in-process
+    filter cost nothing; the rest are checked with a single ANY() query.
+    """
+    known = {url for url in urls if url in known_urls}
+    unknown = [url for url in urls if url not in known]
+    if unknown:
+        rows = session.execute(
+            text(
+                """
+                SELECT url FROM listings WHERE url = ANY(:urls)
+                UNION ALL
+                SELECT url FROM listings_archive WHERE url = ANY(:urls)
+            """
+            ),
+            {"urls": unknown},
+        ).fetchall()
+        for (url,) in rows:
+            known_urls.add(url)
+            known.add(url)
+    logging.debug(f"storage -> repository: {len(known)}/{len(urls)} urls known")
+    return known
 
 
 def listing_exists(session, url: str) -> bool:
-    logging.info(f"Checking if listing exists: {url}")
-    return (
-        session.execute(
-            text("SELECT 1 FROM listings WHERE url = :url LIMIT 1"), {"url": url}
-        ).fetchone()
-        is not None
-    )
+    return url in find_known_urls(session, [url])
 
 
-def get_unsold_urls(session, limit=500):
-    """Return (id, url) for listings not marked as sold."""
-    return session.execute(
+def get_due_listings(session, limit=200):
+    """
+    Claim and return (id, url, created_at, median_survival_days) for unsold
+    listings due for a sold check. Claimed rows get their next check pushed
+    out by a lease, so concurrent workers skip them and a crashed worker's
+    rows become due again once the lease runs out.
+    """
+    now = datetime.datetime.utcnow()
+    rows = session.execute(
         text(
             """
-            SELECT id, url
-            FROM listings
-            WHERE sold_at IS NULL
-            ORDER BY created_at ASC
-            LIMIT :limit
+            UPDATE listings
+            SET next_check_at = :lease_until
+            WHERE id IN (
+                SELECT id
+                FROM listings
+                WHERE sold_at IS NULL
+                AND (next_check_at IS NULL OR next_check_at <= :now)
+                ORDER BY next_check_at ASC NULLS FIRST
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, url, created_at, (
+                SELECT p.value FROM listing_predictions p
+                WHERE p.listing_id = listings.id
+                AND p.model_name = 'median_survival_days'
+            ) AS median_survival_days
         """
         ),
-        {"limit": limit},
+        {
+            "limit": limit,
+            "now": now,
+            "lease_until": now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+        },
     ).fetchall()
+    session.commit()
+    return rows
+
+
+def schedule_rechecks(session, schedule, commit=True):
+    """Stores the check time and the next due time for a batch of (id, next_check_at)."""
+    if not schedule:
+        return
+    now = datetime.datetime.utcnow()
+    session.execute(
+        text(
+            """
+            UPDATE listings
+            SET last_checked_at = :now, next_check_at = :next_check_at
+            WHERE id = :id
+        """
+        ),
+        [{"id": i, "next_check_at": at, "now": now} for i, at in schedule],
+    )
+    if commit:
+        session.commit()
 
 
-def mark_as_sold(session, listing_id: int):
+def mark_as_sold(session, listing_id: int, commit=True):
     session.execute(
         text(
             """
@@ -44,32 +127,58 @@ def mark_as_sold(session, listing_id: int):
         ),
         {"id": listing_id, "now": datetime.datetime.utcnow()},
     )
-    session.commit()
+    if commit:
+        session.commit()
 
 
 def get_listings_without_new_price(session, limit=100):
-    """Return (id, raw_data) for listings with no price_new and not sold."""
-    # Assuming price_new is a column. If not, we might need to check if it exists in raw_data or if the column exists.
-    # The requirement implies a column 'price_new' in the bindings/schema or usage.
-    # If the user says 'store in the price_new field', I'll assume it's a column in the 'listings' table.
-    # However, existing schema in models.py only shows 'id', 'created_at', 'raw_data'.
-    # But the user request says: "stores in the price_new field".
-    # And check_sold.py uses 'sold_at' which is not in models.py either (it uses raw SQL).
-    # So I will assume 'price_new' is a column on 'listings' table, managed via raw SQL or migrations not seen here.
-    return session.execute(
+    """
+    Claim and return (id, raw_data) for unsold listings whose new-price lookup
+    is due: never attempted, or failed earlier and past their backoff.
+    Listings that used up PRICE_LOOKUP_MAX_ATTEMPTS are never returned again.
+    Due rows are locked with FOR UPDATE SKIP LOCKED, so a concurrent worker
+    skips them instead of waiting, and claiming moves next_attempt_at out by
+    a lease, so a crashed worker's rows become due again when it runs out.
+    """
+    now = datetime.datetime.utcnow()
+    claimed = session.execute(
         text(
             """
-            SELECT id, raw_data
-            FROM listings
-            WHERE price_new IS NULL OR price_new = -1
-            LIMIT :limit
+            INSERT INTO price_lookups (listing_id, attempts, next_attempt_at, updated_at)
+            SELECT id, 0, :lease_until, :now
+            FROM (
+                SELECT l.id
+                FROM listings l
+                LEFT JOIN price_lookups q ON q.listing_id = l.id
+                WHERE l.sold_at IS NULL
+                AND (l.price_new IS NULL OR l.price_new = -1)
+                AND (q.listing_id IS NULL OR q.next_attempt_at <= :now)
+                ORDER BY q.next_attempt_at ASC NULLS FIRST
+                LIMIT :limit
+                FOR UPDATE OF l SKIP LOCKED
+            ) due
+            ON CONFLICT (listing_id) DO UPDATE
+            SET next_attempt_at = EXCLUDED.next_attempt_at
+            WHERE price_lookups.next_attempt_at <= :now
+            RETURNING listing_id
         """
         ),
-        {"limit": limit},
+        {
+            "limit": limit,
+            "now": now,
+            "lease_until": now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+        },
+    ).fetchall()
+    session.commit()
+    if not claimed:
+        return []
+    return session.execute(
+        text("SELECT id, raw_data FROM listings WHERE id = ANY(:ids)"),
+        {"ids": [row[0] for row in claimed]},
     ).fetchall()
 
 
-def update_listing_new_price(session, listing_id: int, price: float):
+def update_listing_new_price(session, listing_id: int, price: float, commit=True):
     session.execute(
         text(
             """
@@ -80,10 +189,25 @@ def update_listing_new_price(session, listing_id: int, price: float):
         ),
         {"id": listing_id, "price": price},
     )
-    session.commit()
+    price_history.append(session, price_history.CENEO, [(listing_id, price)])
+    session.execute(
+        text("DELETE FROM price_lookups WHERE listing_id = :id"), {"id": listing_id}
+    )
+    if commit:
+        session.commit()
 
 
-def update_listing_new_price_not_found(session, listing_id: int):
+def update_listing_new_price_not_found(
+    session,
+    listing_id: int,
+    error: str = "not found",
+    give_up: bool = False,
+    commit=True,
+):
+    """
+    Marks the listing with price_new = -1 and schedules the next attempt with
+    exponential backoff, or none once the attempts are used up (or `give_up`).
+    """
     session.execute(
         text(
             """
@@ -94,4 +218,83 @@ def update_listing_new_price_not_found(session, listing_id: int):
         ),
         {"id": listing_id},
     )
+    session.execute(
+        text(
+            """
+            INSERT INTO price_lookups (listing_id, attempts, last_error, next_attempt_at, updated_at)
+            VALUES (
+                :id, 1, :error,
+                CASE WHEN :give_up OR 1 >= :max_attempts THEN NULL
+                     ELSE CAST(:now AS TIMESTAMP) + :base_hours * interval '1 hour' END,
+                :now
+            )
+            ON CONFLICT (listing_id) DO UPDATE SET
+                attempts = price_lookups.attempts + 1,
+                last_error = EXCLUDED.last_error,
+                next_attempt_at =
+                    CASE WHEN :give_up OR price_lookups.attempts + 1 >= :max_attempts THEN NULL
+                         ELSE CAST(:now AS TIMESTAMP)
+                              + :base_hours * power(2, price_lookups.attempts) * interval '1 hour'
+                    END,
+                updated_at = :now
+        """
+        ),
+        {
+            "id": listing_id,
+            "error": error,
+            "give_up": give_up,
+            "max_attempts": PRICE_LOOKUP_MAX_ATTEMPTS,
+            "base_hours": PRICE_LOOKUP_BASE_HOURS,
+            "now": datetime.datetime.utcnow(),
+        },
+    )
+    if commit:
+        session.commit()
+
+
+def get_watermark(session, category_url: str) -> CategoryWatermark:
+    watermark = session.get(CategoryWatermark, category_url)
+    if watermark is None:
+        watermark = CategoryWatermark(category_url=category_url)
+        session.add(watermark)
+        session.commit()
+    return watermark
+
+
+def save_checkpoint(session, watermark, next_page: int, pending_newest_url):
+    watermark.next_page = next_page
+    watermark.pending_newest_url = pending_newest_url
+    session.commit()
+
+
+def complete_walk(session, watermark):
+    if watermark.pending_newest_url:
+        watermark.newest_url = watermark.pending_newest_url
+    watermark.next_page = None
+    watermark.pending_newest_url = None
     session.commit()
+
+
+def get_cached_offers(session, query_key: str):
+    """Cached Ceneo offer prices for `query_key`, or None when missing or expired."""
+    entry = session.get(CeneoPriceCache, query_key)
+    if entry is None or entry.expires_at <= datetime.datetime.utcnow():
+        return None
+    return entry.offers
+
+
+def store_offers(session, query_key: str, offers: list, commit=True):
+    now = datetime.datetime.utcnow()
+    ttl = CENEO_CACHE_TTL_HOURS if offers else CENEO_CACHE_EMPTY_TTL_HOURS
+    values = {
+        "query_key": query_key,
+        "offers": offers,
+        "fetched_at": now,
+        "expires_at": now + datetime.timedelta(hours=ttl),
+    }
+    stmt = insert(CeneoPriceCache).values(**values)
+    session.execute(
+        stmt.on_conflict_do_update(index_elements=["query_key"], set_=values)
+    )
+    if commit:
+        session.commit()
@@ -0,0 +1,46 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from .models import Listing
+
+
+def declared_type(column):
+    return column.type.compile(dialect=postgresql.dialect())
+
+
+def type_mismatches(conn):
+    """Declared listings columns stored with another type, as [(name, actual, declared)]."""
+    actual = dict(
+        conn.execute(
+            text(
+                """
+                SELECT attname, format_type(atttypid, atttypmod)
+                FROM pg_attribute
+                WHERE attrelid = 'listings'::regclass AND attnum > 0 AND NOT attisdropped
+            """
+            )
+        ).fetchall()
+    )
+    mismatches = []
+    for column in Listing.__table__.columns:
+        declared = conn.execute(
+            text("SELECT CAST(CAST(:t AS regtype) AS text)"),
+            {"t": declared_type(column)},
+        ).scalar()
+        if column.name in actual and actual[column.name] != declared:
+            mismatches.append((column.name, actual[column.name], declared))
+    return mismatches
+
+
+def check_schema(conn):
+    """
+    Warns about listings columns that differ from the model. The schema itself
+    is owned by the migrations in db/migrations (python db/migrate.py).
+    """
+    if conn.execute(text("SELECT to_regclass('listings')")).scalar() is None:
+        raise RuntimeError("listings table missing; run python db/migrate.py")
+    for name, actual, declared in type_mismatches(conn):
+        logging.warning(
+            f"storage -> schema: listings.{name} is {actual}, declared {declared}; "
+            f"run python -m storage.typed_migration"
+        )
@@ -1,16 +1,62 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
-from .models import Base
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from .schema import check_schema
+
+_engine = None
+_Session = None
+_async_engine = None
+_AsyncSession = None
+
+
+def get_engine():
+    """The process-wide engine; the schema is checked once, on first use."""
+    global _engine, _Session
+    if _engine is None:
+        _engine = create_engine(
+            DATABASE_URL,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        with _engine.connect() as conn:
+            check_schema(conn)
+        _Session = sessionmaker(bind=_engine)
+    return _engine
 
 
 def init_db():
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        pool_size=5,
-        max_overflow=10,
-    )
-    Base.metadata.create_all(engine)
-    return sessionmaker(bind=engine)()
+    """Returns a new session on the shared engine."""
+    get_engine()
+    return _Session()
+
+
+async def get_async_engine():
+    """
+    The process-wide asyncpg engine. Its pool is shared by every coroutine of
+    the crawler; a session holds a connection only while in a transaction.
+    """
+    global _async_engine, _AsyncSession
+    if _async_engine is None:
+        engine = create_async_engine(
+            make_url(DATABASE_URL).set(drivername="postgresql+asyncpg"),
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        async with engine.connect() as conn:
+            await conn.run_sync(check_schema)
+        _async_engine = engine
+        # Objects stay readable after commit without a lazy reload
+        _AsyncSession = async_sessionmaker(engine, expire_on_commit=False)
+    return _async_engine
+
+
+async def init_async_db():
+    """Returns a new AsyncSession on the shared async engine."""
+    await get_async_engine()
+    return _AsyncSession()
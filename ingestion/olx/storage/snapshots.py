@@ -0,0 +1,110 @@
+import asyncio, datetime, hashlib, json, logging, os, sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import zstandard
+from config import SNAPSHOT_DIR, SNAPSHOT_ZSTD_LEVEL
+
+
+class SnapshotStore:
+    """
+    Local store of fetched listing pages. Each snapshot is a small JSON
+    document (the JSON-LD text, the seller link and optionally the HTML)
+    written once as blobs/<sha[:2]>/<sha>.zst, keyed by the sha256 of its
+    content, so identical pages share a blob. A SQLite index maps
+    (url, fetched_at) to the blob.
+
+    Crawl coroutines call `save_async`, which hands the dump, compression
+    and writes to one writer thread, so the shared event loop never blocks
+    on them and the SQLite connection is only used from that thread.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._db = None
+        self._compressor = zstandard.ZstdCompressor(level=SNAPSHOT_ZSTD_LEVEL)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._writer = None
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"))
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    url TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    PRIMARY KEY (url, fetched_at)
+                )
+            """
+            )
+        return self._db
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.zst")
+
+    def save(self, url, fragments: dict, fetched_at=None):
+        """Stores `fragments` for `url`; failures are logged, never raised."""
+        if not self.enabled:
+            return None
+        fetched_at = fetched_at or datetime.datetime.utcnow()
+        try:
+            raw = json.dumps(fragments, sort_keys=True).encode()
+            digest = hashlib.sha256(raw).hexdigest()
+            path = self.blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(self._compressor.compress(raw))
+                os.replace(tmp, path)
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                    (url, fetched_at.isoformat(), digest),
+                )
+            return digest
+        except Exception as e:
+            logging.error(f"storage -> snapshots: Could not snapshot {url}: {e}")
+            return None
+
+    async def save_async(self, url, fragments: dict):
+        """save() on the writer thread; the fetch time is taken now."""
+        if not self.enabled:
+            return None
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="snapshots"
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer, self.save, url, fragments, datetime.datetime.utcnow()
+        )
+
+    def load(self, digest) -> dict:
+        with open(self.blob_path(digest), "rb") as f:
+            return json.loads(self._decompressor.decompress(f.read()))
+
+    def latest(self, since=None):
+        """Yields (url, fetched_at, digest) of the newest snapshot of every url."""
+        rows = self.db.execute(
+            """
+            SELECT url, max(fetched_at), digest
+            FROM snapshots
+            WHERE fetched_at >= ?
+            GROUP BY url
+            ORDER BY url
+        """,
+            ((since or datetime.datetime.min).isoformat(),),
+        )
+        for url, fetched_at, digest in rows:
+            yield url, datetime.datetime.fromisoformat(fetched_at), digest
+
+
+snapshots = SnapshotStore(SNAPSHOT_DIR)
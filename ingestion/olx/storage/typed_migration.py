@@ -0,0 +1,238 @@
+"""
+Online conversion of the listings columns created as TEXT by the old
+runtime-column save path to their declared types (see models.Listing).
+
+Per column, without holding a long lock:
+
+  1. add a shadow column of the declared type, kept in sync by a trigger;
+  2. backfill it in id ranges of --batch rows, one short transaction each,
+     with try_cast() turning values that do not parse into NULL;
+  3. swap in one transaction: drop the old column with the generated
+     columns and indexes that depend on it, rename the shadow column, then
+     recreate its default, the generated columns (from their stored
+     expressions, e.g. discount_ratio) and the indexes.
+
+Recreating a STORED generated column rewrites the table, so step 3 takes
+as long as that rewrite when such columns exist.
+
+Keys without a column stay in raw_data; they can be exposed as a generated
+column or given an expression index:
+
+    python -m storage.typed_migration plan
+    python -m storage.typed_migration run [--batch 5000] [--pause 0.1]
+    python -m storage.typed_migration expose KEY TYPE
+    python -m storage.typed_migration index KEY
+"""
+
+import argparse, logging, re, time
+from sqlalchemy import text
+from .session import get_engine
+from .schema import type_mismatches
+
+logging.basicConfig(level=logging.INFO)
+
+
+def shadow(name):
+    return f"{name}__typed"
+
+
+def start_shadow(conn, name, declared):
+    conn.execute(
+        text(
+            f'ALTER TABLE listings ADD COLUMN IF NOT EXISTS "{shadow(name)}" {declared}'
+        )
+    )
+    conn.execute(
+        text(
+            f"""
+            CREATE OR REPLACE FUNCTION listings_sync_{name}() RETURNS trigger AS $$
+            BEGIN
+                NEW."{shadow(name)}" := try_cast(NEW."{name}"::text, NULL::{declared});
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """
+        )
+    )
+    conn.execute(
+        text(
+            f"""
+            CREATE OR REPLACE TRIGGER listings_sync_{name}
+            BEFORE INSERT OR UPDATE ON listings
+            FOR EACH ROW EXECUTE FUNCTION listings_sync_{name}()
+        """
+        )
+    )
+
+
+def backfill(engine, name, declared, batch, pause):
+    with engine.connect() as conn:
+        low, high = conn.execute(text("SELECT min(id), max(id) FROM listings")).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, batch):
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"""
+                    UPDATE listings
+                    SET "{shadow(name)}" = try_cast("{name}"::text, NULL::{declared})
+                    WHERE id >= :start AND id < :end
+                """
+                ),
+                {"start": start, "end": start + batch},
+            )
+        logging.info(
+            f"storage -> typed_migration: {name} backfilled up to id {start + batch - 1}/{high}"
+        )
+        time.sleep(pause)
+
+
+def dependents(conn, name):
+    """Generated columns and indexes built on `name`, with what recreates them."""
+    generated = conn.execute(
+        text(
+            """
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod),
+                   pg_get_expr(d.adbin, d.adrelid)
+            FROM pg_attribute a
+            JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            JOIN pg_depend dep
+              ON dep.classid = 'pg_attrdef'::regclass AND dep.objid = d.oid
+            JOIN pg_attribute src
+              ON src.attrelid = dep.refobjid AND src.attnum = dep.refobjsubid
+            WHERE a.attrelid = 'listings'::regclass AND a.attgenerated = 's'
+            AND dep.refobjid = 'listings'::regclass AND src.attname = :name
+        """
+        ),
+        {"name": name},
+    ).fetchall()
+    columns = [name] + [column for column, _, _ in generated]
+    indexes = conn.execute(
+        text(
+            """
+            SELECT DISTINCT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_depend dep
+              ON dep.classid = 'pg_class'::regclass AND dep.objid = i.indexrelid
+            JOIN pg_attribute src
+              ON src.attrelid = dep.refobjid AND src.attnum = dep.refobjsubid
+            WHERE i.indrelid = 'listings'::regclass
+            AND dep.refobjid = 'listings'::regclass AND src.attname = ANY(:columns)
+        """
+        ),
+        {"columns": columns},
+    ).fetchall()
+    default = conn.execute(
+        text(
+            """
+            SELECT pg_get_expr(d.adbin, d.adrelid)
+            FROM pg_attribute a
+            JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            WHERE a.attrelid = 'listings'::regclass AND a.attname = :name
+            AND a.attgenerated = ''
+        """
+        ),
+        {"name": name},
+    ).scalar()
+    return generated, indexes, default
+
+
+def swap(engine, name):
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text("LOCK TABLE listings IN ACCESS EXCLUSIVE MODE"))
+        generated, indexes, default = dependents(conn, name)
+
+        conn.execute(text(f"DROP TRIGGER listings_sync_{name} ON listings"))
+        conn.execute(text(f"DROP FUNCTION listings_sync_{name}()"))
+        for column, _, _ in generated:
+            conn.execute(text(f'ALTER TABLE listings DROP COLUMN "{column}"'))
+        conn.execute(text(f'ALTER TABLE listings DROP COLUMN "{name}"'))
+        conn.execute(
+            text(f'ALTER TABLE listings RENAME COLUMN "{shadow(name)}" TO "{name}"')
+        )
+        if default is not None:
+            conn.execute(
+                text(
+                    f'ALTER TABLE listings ALTER COLUMN "{name}" SET DEFAULT {default}'
+                )
+            )
+        for column, column_type, expression in generated:
+            logging.info(f"storage -> typed_migration: Recreating generated {column}")
+            conn.execute(
+                text(
+                    f'ALTER TABLE listings ADD COLUMN "{column}" {column_type} '
+                    f"GENERATED ALWAYS AS ({expression}) STORED"
+                )
+            )
+        for index, definition in indexes:
+            logging.info(f"storage -> typed_migration: Recreating index {index}")
+            conn.execute(text(definition))
+
+
+def migrate_column(engine, name, declared, batch, pause):
+    logging.info(f"storage -> typed_migration: Converting {name} to {declared}")
+    with engine.begin() as conn:
+        start_shadow(conn, name, declared)
+    backfill(engine, name, declared, batch, pause)
+    swap(engine, name)
+    logging.info(f"storage -> typed_migration: {name} is now {declared}")
+
+
+def raw_key(key):
+    if not re.fullmatch(r"[a-z0-9_]+", key):
+        raise SystemExit(f"invalid key {key!r}: use lowercase letters, digits and _")
+    return key
+
+
+def expose(engine, key, column_type):
+    """Adds raw_data->>key as a typed generated column."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'ALTER TABLE listings ADD COLUMN IF NOT EXISTS "{raw_key(key)}" {column_type} '
+                f"GENERATED ALWAYS AS (try_cast(raw_data->>'{key}', NULL::{column_type})) STORED"
+            )
+        )
+
+
+def index(engine, key):
+    """Builds an expression index on raw_data->>key without blocking writes."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(
+            text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS listings_raw_{raw_key(key)}_idx "
+                f"ON listings ((raw_data->>'{key}'))"
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("plan", help="list columns whose type differs from the model")
+    run_cmd = sub.add_parser("run", help="convert those columns online")
+    run_cmd.add_argument("--batch", type=int, default=5000)
+    run_cmd.add_argument("--pause", type=float, default=0.1)
+    expose_cmd = sub.add_parser("expose", help="generated column from raw_data")
+    expose_cmd.add_argument("key")
+    expose_cmd.add_argument("type")
+    index_cmd = sub.add_parser("index", help="expression index on raw_data")
+    index_cmd.add_argument("key")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "expose":
+        expose(engine, args.key, args.type)
+    elif args.command == "index":
+        index(engine, args.key)
+    else:
+        with engine.connect() as conn:
+            mismatches = type_mismatches(conn)
+        for name, actual, declared in mismatches:
+            print(f"{name}: {actual} -> {declared}")
+            if args.command == "run":
+                migrate_column(engine, name, declared, args.batch, args.pause)
+        if not mismatches:
+            print("listings columns match the model")
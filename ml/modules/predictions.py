@@ -0,0 +1,75 @@
+import datetime
+import hashlib
+import logging
+import os
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def model_version(model_path):
+    """Name and content hash of a saved model file, e.g. price_model.cbm@3f2a9c01d4e7."""
+    with open(model_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"{os.path.basename(model_path)}@{digest}"
+
+
+def store_predictions(conn, model_name, version, df, epsilon):
+    """
+    Upserts the `value` column of `df` (indexed by listing `id`) into
+    listing_predictions under `model_name`. Predictions that moved by less
+    than `epsilon` from the stored value are not written at all, so a pass
+    only touches the rows whose prediction changed. Returns rows written.
+
+    Uploads the predictions to the temp table tmp_predictions, which lives
+    until the caller's transaction ends.
+    """
+    conn.execute(
+        text(
+            "CREATE TEMP TABLE tmp_predictions (listing_id INT, value FLOAT) ON COMMIT DROP"
+        )
+    )
+    df[["id", "value"]].rename(columns={"id": "listing_id"}).to_sql(
+        "tmp_predictions", conn, if_exists="append", index=False
+    )
+    written = conn.execute(
+        text(
+            """
+            INSERT INTO listing_predictions (listing_id, model_name, model_version, value, predicted_at)
+            SELECT t.listing_id, :model_name, :version, t.value, :now
+            FROM tmp_predictions t
+            LEFT JOIN listing_predictions p
+              ON p.listing_id = t.listing_id AND p.model_name = :model_name
+            WHERE p.listing_id IS NULL OR abs(p.value - t.value) >= :epsilon
+            ON CONFLICT (listing_id, model_name) DO UPDATE
+            SET value = EXCLUDED.value,
+                model_version = EXCLUDED.model_version,
+                predicted_at = EXCLUDED.predicted_at
+        """
+        ),
+        {
+            "model_name": model_name,
+            "version": version,
+            "now": datetime.datetime.utcnow(),
+            "epsilon": epsilon,
+        },
+    ).rowcount
+    logger.info(
+        f"{model_name}: wrote {written} of {len(df)} predictions "
+        f"(epsilon {epsilon}, model {version})"
+    )
+    return written
+
+
+def refresh_deals(engine):
+    """
+    Rebuilds the listing_deals materialized view the API ranks deals from
+    (db/migrations/V010__listing_deals.sql). CONCURRENTLY keeps it readable
+    during the refresh.
+    """
+    start = datetime.datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY listing_deals"))
+    seconds = (datetime.datetime.utcnow() - start).total_seconds()
+    logger.info(f"Refreshed listing_deals in {seconds:.1f}s")
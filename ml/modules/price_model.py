@@ -10,11 +10,16 @@ logger = logging.getLogger(__name__)
 from sqlalchemy import create_engine, text
 from catboost import CatBoostRegressor, Pool
 
+from .predictions import model_version, refresh_deals, store_predictions
+
 # 1. SETUP ENGINE
 DB_URL = os.getenv("DATABASE_URL", "postgresql://postgres:password@db:5432/pricer")
 engine = create_engine(DB_URL)
 
 MODEL_PATH = "/app/models/price_model.cbm"
+MODEL_NAME = "discount_ratio"
+# Predicted ratios that move less than this keep their stored value
+PREDICTION_EPSILON = float(os.getenv("PRICE_PREDICTION_EPSILON", "0.005"))
 
 # Define categorical features globally
 CATEGORICAL_FEATURES = [
@@ -51,15 +56,17 @@ def preprocess_data(df):
     return df
 
 
-query = """
+# Predictions read active listings; training also reads archived ones
+query_from = """
         SELECT id, created_at, category, sku, condition, city,
                seller_id, embeddings::text as embeddings, discount_ratio
-        FROM listings 
+        FROM {table}
     """
+query = query_from.format(table="listings")
 
 
 def run_predictions(model):
-    """Predicts prices for all records where price_predicted is NULL."""
+    """Scores unsold listings and stores the ratios that changed."""
     logger.info("Running prediction pass for new records...")
 
     df = pd.read_sql(
@@ -81,46 +88,35 @@ def run_predictions(model):
     # Prepare features to match training format
     X = df.drop(["id", "discount_ratio"], axis=1)
 
-    # Generate predictions and round to INT
     preds = model.predict(X)
-    df["discount_ratio_predicted"] = preds.astype(float)
+    df["value"] = preds.astype(float)
 
-    # Bulk update using a temporary table
     with engine.begin() as conn:
-        conn.execute(
-            text(
-                "CREATE TEMP TABLE tmp_preds (id INT, discount_ratio_predicted FLOAT) ON COMMIT DROP"
-            )
-        )
-
-        # Upload just the mapping
-        df[["id", "discount_ratio_predicted"]].to_sql(
-            "tmp_preds", conn, if_exists="append", index=False
+        store_predictions(
+            conn, MODEL_NAME, model_version(MODEL_PATH), df, PREDICTION_EPSILON
         )
-
-        # Join update - FIXED: use price_predicted instead of pred
-        conn.execute(
+        # Only listings waiting for a rescore after a new price_new are touched
+        repriced = conn.execute(
             text(
                 """
-            UPDATE listings 
-            SET discount_ratio_predicted = tmp_preds.discount_ratio_predicted,
-                is_pending_repricing = false
-            FROM tmp_preds
-            WHERE listings.id = tmp_preds.id
+            UPDATE listings
+            SET is_pending_repricing = false
+            FROM tmp_predictions
+            WHERE listings.id = tmp_predictions.listing_id
+            AND listings.is_pending_repricing
         """
             )
-        )
+        ).rowcount
 
-    logger.info(
-        f"Successfully updated {len(df)} records with discount_ratio_predicted."
-    )
+    logger.info(f"Scored {len(df)} listings, {repriced} were pending repricing.")
+    refresh_deals(engine)
 
 
 def train_cycle():
     # 2. FETCH DATA (Excluding zero prices)
 
     df = pd.read_sql(
-        query
+        query_from.format(table="listings_all")
         + """
         WHERE price > 0
         AND embeddings IS NOT NULL
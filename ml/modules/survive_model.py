@@ -7,14 +7,19 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from catboost import CatBoostRegressor, Pool
 
+from .predictions import model_version, refresh_deals, store_predictions
+
 # 1. SETUP ENGINE
 DB_URL = os.getenv("DATABASE_URL", "postgresql://postgres:password@db:5432/pricer")
 engine = create_engine(DB_URL)
 
 MODEL_PATH = "/app/models/survive_model.cbm"
+MODEL_NAME = "median_survival_days"
+# Predictions that move less than this many days keep their stored value
+PREDICTION_EPSILON = float(os.getenv("SURVIVAL_PREDICTION_EPSILON", "1"))
 
 # Define categorical features globally
 CATEGORICAL_FEATURES = [
@@ -70,7 +75,7 @@ def preprocess_data(df):
 
 
 def run_predictions(model):
-    """Predicts prices for all records where price_predicted is NULL."""
+    """Scores listings with a vector and stores the survival times that changed."""
     logger.info("Running prediction pass for new records...")
 
     # Fetch records that have embeddings but no prediction yet
@@ -106,36 +111,15 @@ def run_predictions(model):
     )
     X = X[cols]
 
-    # Generate predictions and round to INT
+    # Generate predictions and round to whole days
     preds = model.predict(X)
-    df["median_survival_days"] = np.round(preds).astype(int)
+    df["value"] = np.round(preds).astype(float)
 
-    # Bulk update using a temporary table
     with engine.begin() as conn:
-        conn.execute(
-            text(
-                "CREATE TEMP TABLE tmp_survival_preds (id INT, median_survival_days INT) ON COMMIT DROP"
-            )
+        store_predictions(
+            conn, MODEL_NAME, model_version(MODEL_PATH), df, PREDICTION_EPSILON
         )
-
-        # Upload just the mapping
-        df[["id", "median_survival_days"]].to_sql(
-            "tmp_survival_preds", conn, if_exists="append", index=False
-        )
-
-        # Join update - FIXED: use price_predicted instead of pred
-        conn.execute(
-            text(
-                """
-            UPDATE listings 
-            SET median_survival_days = tmp_survival_preds.median_survival_days
-            FROM tmp_survival_preds
-            WHERE listings.id = tmp_survival_preds.id
-        """
-            )
-        )
-
-    logger.info(f"Successfully updated {len(df)} records with median_survival_days.")
+    refresh_deals(engine)
 
 
 def train_cycle():
@@ -144,7 +128,7 @@ def train_cycle():
         SELECT price, created_at, sold_at, category, 
                sku, condition, city, 
                seller_id, embeddings::text as embeddings
-        FROM listings 
+        FROM listings_all
         WHERE price > 0 AND embeddings IS NOT NULL
     """
     df = pd.read_sql(query, engine)